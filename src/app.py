@@ -7,20 +7,22 @@ from pathlib import Path
 from flask import Flask, jsonify, request, Response
 
 from compliance_assistant.validate import validate_text
-from compliance_assistant.validate import _load_rules as _load_rules_cfg  # type: ignore
+from compliance_assistant.rules import citation_templates, get_rules
 import os
 from compliance_assistant.parsers.factory import ParserFactory
-from compliance_assistant.kb import load_guidelines
+from compliance_assistant.kb import indexed_paths, load_kb, update_index
 from compliance_assistant.sectionizer import split_into_sections
+from compliance_assistant.snapshot import KBSnapshots
 from frontend import get_frontend_html
 
 app = Flask(__name__)
 app.config["MAX_CONTENT_LENGTH"] = 128 * 1024 * 1024  # 128 MB
 
-# Paths of guideline files used for KB (defaults). Users can upload new ones at /guidelines
+# Guideline files used for the KB (defaults). Users can upload new ones at /guidelines
 GUIDELINE_DIR = Path("kb_uploads")
 GUIDELINE_DIR.mkdir(exist_ok=True)
-GUIDELINE_PATHS = [
+GUIDELINE_SUFFIXES = {".txt", ".pdf", ".docx"}  # parsed with ParserFactory when indexed
+DEFAULT_GUIDELINES = [
 	str(Path("21.txt")),
 	str(Path("general.txt")),
 ]
@@ -30,6 +32,49 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("parser-app")
 
 
+def _kb_backend():
+	try:
+		return get_rules().kb.get("embed_backend")
+	except Exception:
+		return None
+
+
+def _rules_sha() -> str:
+	try:
+		return get_rules().sha256
+	except Exception:
+		return ""
+
+
+def _build_kb(paths):
+	# Runs on the KB writer thread only; the citation table is filled before publishing
+	kb = load_kb(list(paths), backend=_kb_backend())
+	kb.precompute_citations(citation_templates(get_rules()))
+	return kb
+
+
+# Requests read the published snapshot without locking; guideline and rules
+# changes build a new one on the writer thread and swap it in
+KB_SNAPSHOTS = KBSnapshots(_build_kb, fingerprint=_rules_sha)
+
+# Build (or open) the persisted KB index once at startup, keeping guidelines
+# uploaded in earlier runs (recorded in the KB index manifest). Skipped in
+# ingestion worker processes, which re-import this script as __mp_main__.
+if __name__ != "__mp_main__":
+	try:
+		_initial = DEFAULT_GUIDELINES + [p for p in indexed_paths() if p not in DEFAULT_GUIDELINES]
+		KB_SNAPSHOTS.rebuild([p for p in _initial if Path(p).exists()]).result()
+	except Exception:
+		logger.exception("Could not prepare KB index at startup")
+
+
+def _current_kb():
+	# A rules change schedules a rebuild (with a fresh citation table); until it
+	# is published, requests keep the current snapshot
+	KB_SNAPSHOTS.refresh_if_stale()
+	return KB_SNAPSHOTS.current.kb
+
+
 @app.get("/health")
 def health():
 	return {"status": "ok"}
@@ -44,8 +89,7 @@ def index() -> Response:
 @app.get("/llm_status")
 def llm_status():
 	try:
-		rules = _load_rules_cfg(None)
-		llm = rules.get("llm", {}) if isinstance(rules, dict) else {}
+		llm = get_rules().llm
 		enabled = bool(llm.get("enabled", False))
 		provider = (llm.get("provider") or "").lower()
 		if provider == "azure":
@@ -74,25 +118,67 @@ def llm_status():
 @app.get("/guidelines")
 def get_guidelines():
 	# Return list of current guideline files
-	return jsonify({"files": GUIDELINE_PATHS})
+	return jsonify({"files": list(KB_SNAPSHOTS.current.paths)})
 
 
 @app.post("/guidelines")
 def post_guidelines():
-	# Accept multiple .txt files and add to KB list
-	files = request.files.getlist("files")
-	added: list[str] = []
-	for f in files:
+	# Accept multiple .txt/.pdf/.docx files; only new or changed content is indexed.
+	# Re-uploading a file under its existing name replaces it.
+	uploads = []
+	unsupported: list[str] = []
+	for f in request.files.getlist("files"):
 		name = (f.filename or "guideline.txt").strip()
-		if not name:
+		if Path(name).suffix.lower() not in GUIDELINE_SUFFIXES:
+			unsupported.append(name)
 			continue
-		path = GUIDELINE_DIR / Path(name).name
 		data = f.read()
-		if not data:
-			continue
-		path.write_bytes(data)
-		GUIDELINE_PATHS.append(str(path))
-	return jsonify({"ok": True, "files": GUIDELINE_PATHS})
+		if name and data:
+			uploads.append((GUIDELINE_DIR / Path(name).name, data))
+	if unsupported and not uploads:
+		return jsonify({"error": f"Unsupported file type(s): {', '.join(unsupported)}"}), 400
+
+	def change(paths):
+		# Runs on the KB writer thread; the index must reflect ``paths`` before files are replaced
+		load_kb(list(paths), backend=_kb_backend())
+		for path, data in uploads:
+			path.write_bytes(data)
+		update = update_index(add=[str(p) for p, _ in uploads], backend=_kb_backend())
+		return update.kb.paths, update
+
+	try:
+		update = KB_SNAPSHOTS.update(change).result()
+	except Exception as e:
+		logger.exception("Error while updating guideline index")
+		return jsonify({"error": str(e)}), 500
+	return jsonify({
+		"ok": True,
+		"files": list(KB_SNAPSHOTS.current.paths),
+		"added": update.added,
+		"replaced": update.replaced,
+		"skipped": update.skipped,
+		"failed": update.failed,
+		"unsupported": unsupported,
+	})
+
+
+@app.delete("/guidelines/<path:name>")
+def delete_guideline(name: str):
+	matches = [p for p in KB_SNAPSHOTS.current.paths if p == name or Path(p).name == name]
+	if not matches:
+		return jsonify({"error": f"Unknown guideline: {name}"}), 404
+
+	def change(paths):
+		load_kb(list(paths), backend=_kb_backend())
+		update = update_index(remove=matches, backend=_kb_backend())
+		return update.kb.paths, update
+
+	try:
+		update = KB_SNAPSHOTS.update(change).result()
+	except Exception as e:
+		logger.exception("Error while removing guideline")
+		return jsonify({"error": str(e)}), 500
+	return jsonify({"ok": True, "files": list(KB_SNAPSHOTS.current.paths), "removed": update.removed})
 
 
 @app.post("/parse")
@@ -150,6 +236,11 @@ def parse_upload():
 			pass
 
 
+def _cache_bypassed() -> bool:
+	# ?nocache=1 re-asks the LLM instead of replaying a cached review
+	return request.args.get("nocache", "").lower() in ("1", "true", "yes")
+
+
 @app.post("/validate")
 def validate_upload():
 	# JSON API for programmatic clients (kept for completeness)
@@ -165,8 +256,8 @@ def validate_upload():
 			tmp_path = Path(tmp.name)
 		parser = ParserFactory.for_file(tmp_path)
 		parsed = parser.parse(tmp_path)
-		kb = load_guidelines([p for p in GUIDELINE_PATHS if Path(p).exists()])
-		result = validate_text(parsed.text, meta=parsed.meta, kb=kb)
+		kb = _current_kb()
+		result = validate_text(parsed.text, meta=parsed.meta, kb=kb, llm_cache=not _cache_bypassed())
 		return jsonify({"score": result.score, "findings": [f.__dict__ for f in result.findings], "meta": result.meta})
 	except Exception as e:
 		logger.exception("Error while validating upload (JSON endpoint)")
@@ -196,8 +287,8 @@ def validate_upload_html():
 			tmp_path = Path(tmp.name)
 		parser = ParserFactory.for_file(tmp_path)
 		parsed = parser.parse(tmp_path)
-		kb = load_guidelines([p for p in GUIDELINE_PATHS if Path(p).exists()])
-		result = validate_text(parsed.text, meta=parsed.meta, kb=kb)
+		kb = _current_kb()
+		result = validate_text(parsed.text, meta=parsed.meta, kb=kb, llm_cache=not _cache_bypassed())
 
 		rows = []
 		for f in result.findings:
@@ -207,6 +298,7 @@ def validate_upload_html():
 			sec = f.section or "—"
 			cit_full = (f.citation or "").replace("<", "&lt;").replace(">", "&gt;")
 			cit_short = cit_full[:160] + ("..." if len(cit_full) > 160 else "")
+			cit_src = f"<div style='color:#666;font-size:12px'>{f.citation_source}</div>" if f.citation_source else ""
 			if f.id == "missing_section":
 				sugg = "Add the missing section and define ownership, storage, retention, and signatures."
 			elif f.id == "stale_reference":
@@ -224,7 +316,7 @@ def validate_upload_html():
 				f"<td>{sec}</td>"
 				f"<td>{ctx}</td>"
 				f"<td style='max-width:520px;white-space:pre-wrap'>"
-				f"{cit_short}"
+				f"{cit_short}{cit_src}"
 				f"<details><summary style='cursor:pointer;color:#0366d6;margin-top:4px'>Show full</summary>"
 				f"<pre style='white-space:pre-wrap'>{cit_full}</pre>"
 				f"</details>"
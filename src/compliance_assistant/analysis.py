@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right
+from functools import cached_property
+from typing import Dict, List, Sequence, Tuple
+
+from .dates import DateMention, extract_dates
+
+
+def _is_word(ch: str) -> bool:
+	# Same definition as the re module's \w for str patterns
+	return ch.isalnum() or ch == "_"
+
+
+class DocumentAnalysis:
+	"""Per-document groundwork shared by the validation detectors.
+
+	Built once per document: the lowercased text and, lazily, a line-offset
+	table, the date mentions and the positions of every keyword a detector
+	asks about (each term is located with one pass over the document, then
+	answered by bisection). Queries reproduce what the detectors used to
+	compute on text slices.
+	"""
+
+	def __init__(self, text: str) -> None:
+		self.text = text
+		self.lower = text.lower()
+		# str.lower() can change the length of a few characters (e.g. "İ"); offsets
+		# into ``lower`` are then unusable and window queries fall back to slicing
+		self.aligned = len(self.lower) == len(text)
+		self._spans: Dict[str, Tuple[List[int], List[int]]] = {}
+		self._literals: Dict[str, List[int]] = {}
+		self._word_res: Dict[Tuple[str, ...], re.Pattern] = {}
+
+	@cached_property
+	def line_starts(self) -> List[int]:
+		"""Offset of each line as ``splitlines`` cuts them."""
+		starts = [0]
+		for line in self.text.splitlines(keepends=True):
+			starts.append(starts[-1] + len(line))
+		return starts[:-1] if len(starts) > 1 else starts
+
+	@cached_property
+	def dates(self) -> List[DateMention]:
+		"""Date mentions in document order (see dates.extract_dates), extracted once."""
+		return extract_dates(self.text)
+
+	def spans(self, term: str) -> Tuple[List[int], List[int]]:
+		"""(starts, ends) of every occurrence of regex ``term`` in the lowercased text, overlaps included."""
+		found = self._spans.get(term)
+		if found is None:
+			starts: List[int] = []
+			ends: List[int] = []
+			for m in re.finditer(f"(?=({term}))", self.lower):
+				starts.append(m.start(1))
+				ends.append(m.end(1))
+			found = self._spans[term] = (starts, ends)
+		return found
+
+	def _window(self, start: int, end: int, radius: int) -> Tuple[int, int]:
+		return max(0, start - radius), min(len(self.text), end + radius)
+
+	def word_near(self, terms: Sequence[str], start: int, end: int, radius: int = 80) -> bool:
+		"""Same as ``re.search(r"\\b(t1|t2|...)\\b", text[start-radius:end+radius].lower())``.
+
+		Terms are regexes that begin and end with word characters; the window
+		edges count as word boundaries, exactly as they do for the slice.
+		"""
+		lo, hi = self._window(start, end, radius)
+		if not self.aligned:
+			key = tuple(terms)
+			pat = self._word_res.get(key)
+			if pat is None:
+				pat = self._word_res[key] = re.compile(r"\b(" + "|".join(terms) + r")\b")
+			return pat.search(self.text[lo:hi].lower()) is not None
+		lower = self.lower
+		for term in terms:
+			starts, ends = self.spans(term)
+			for i in range(bisect_left(starts, lo), len(starts)):
+				s, e = starts[i], ends[i]
+				if s >= hi:
+					break
+				if e > hi:
+					continue
+				if (s == lo or not _is_word(lower[s - 1])) and (e == hi or not _is_word(lower[e])):
+					return True
+		return False
+
+	def contains(self, literal: str, start: int, end: int, radius: int = 80) -> bool:
+		"""Same as ``literal in text[start-radius:end+radius].lower()``."""
+		lo, hi = self._window(start, end, radius)
+		if not self.aligned:
+			return literal in self.text[lo:hi].lower()
+		starts = self._literals.get(literal)
+		if starts is None:
+			starts = self._literals[literal] = []
+			pos = self.lower.find(literal)
+			while pos != -1:
+				starts.append(pos)
+				pos = self.lower.find(literal, pos + 1)
+		i = bisect_left(starts, lo)
+		return i < len(starts) and starts[i] + len(literal) <= hi
+
+	def lines(self, start: int, end: int) -> List[str]:
+		"""Stripped, non-empty lines of ``text[start:end]`` (as ``splitlines`` would cut them)."""
+		first = max(0, bisect_right(self.line_starts, start) - 1)
+		out: List[str] = []
+		n = len(self.line_starts)
+		for i in range(first, n):
+			ls = self.line_starts[i]
+			if ls >= end:
+				break
+			le = self.line_starts[i + 1] if i + 1 < n else len(self.text)
+			line = self.text[max(ls, start): min(le, end)].strip()
+			if line:
+				out.append(line)
+		return out
+
+	def excerpt(self, start: int, end: int, radius: int = 80) -> str:
+		"""Readable excerpt around [start:end]: whitespace collapsed, ellipses where cut."""
+		lo, hi = self._window(start, end, radius)
+		snip = " ".join(self.text[lo:hi].split())
+		prefix = "… " if lo > 0 else ""
+		suffix = " …" if hi < len(self.text) else ""
+		return f"{prefix}{snip}{suffix}"
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .atomic import save_npy
+
+
+# Rows per block when assigning vectors to centroids; bounds the temporary
+# (block x nlist) score matrix for very large corpora.
+_ASSIGN_BLOCK = 65536
+
+
+def _unit(mat: np.ndarray) -> np.ndarray:
+	norms = np.linalg.norm(mat, axis=1, keepdims=True)
+	return (mat / (norms + 1e-8)).astype(np.float32)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+	labels = np.empty(len(vectors), dtype=np.int64)
+	for lo in range(0, len(vectors), _ASSIGN_BLOCK):
+		block = np.asarray(vectors[lo: lo + _ASSIGN_BLOCK], dtype=np.float32)
+		labels[lo: lo + len(block)] = np.argmax(block @ centroids.T, axis=1)
+	return labels
+
+
+@dataclass
+class IVFIndex:
+	"""Inverted-file index over L2-normalized vectors (spherical k-means).
+
+	Each vector belongs to the list of its nearest centroid. A query only scores
+	the vectors of its ``nprobe`` nearest lists, so cost scales with
+	``nprobe / nlist`` of the corpus instead of the whole corpus. Raise
+	``nprobe`` for recall, lower it for latency; ``nprobe == nlist`` is exact.
+	"""
+	centroids: np.ndarray  # (nlist, dim) float32, normalized
+	offsets: np.ndarray    # (nlist + 1,) int64; list c is ids[offsets[c]:offsets[c+1]]
+	ids: np.ndarray        # (n,) int64 row ids grouped by list
+	nprobe: int = 8
+
+	@property
+	def nlist(self) -> int:
+		return len(self.centroids)
+
+	@classmethod
+	def build(
+		cls,
+		vectors: np.ndarray,
+		nlist: Optional[int] = None,
+		nprobe: int = 8,
+		iters: int = 10,
+		sample: int = 64,
+		seed: int = 0,
+	) -> "IVFIndex":
+		"""Cluster ``vectors`` into ``nlist`` lists (default ~4*sqrt(n)).
+
+		k-means is trained on at most ``sample`` points per list, then every
+		vector is assigned to its nearest centroid.
+		"""
+		n = len(vectors)
+		if n == 0:
+			raise ValueError("Cannot build an IVF index over an empty matrix")
+		nlist = max(1, min(n, int(nlist or round(4 * math.sqrt(n)))))
+		rng = np.random.default_rng(seed)
+		train_idx = rng.choice(n, size=min(n, nlist * sample), replace=False)
+		train_idx.sort()
+		train = np.asarray(vectors[train_idx], dtype=np.float32)
+		centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+		for _ in range(iters):
+			labels = _assign(train, centroids)
+			order = np.argsort(labels, kind="stable")
+			counts = np.bincount(labels, minlength=nlist)
+			sums = np.zeros_like(centroids)
+			present = np.flatnonzero(counts)
+			starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[present]
+			sums[present] = np.add.reduceat(train[order], starts, axis=0)
+			empty = counts == 0
+			if empty.any():
+				# Re-seed empty lists from random training points
+				sums[empty] = train[rng.choice(len(train), size=int(empty.sum()))]
+			centroids = _unit(sums)
+		labels = _assign(vectors, centroids)
+		order = np.argsort(labels, kind="stable")
+		counts = np.bincount(labels, minlength=nlist)
+		offsets = np.zeros(nlist + 1, dtype=np.int64)
+		np.cumsum(counts, out=offsets[1:])
+		return cls(centroids=centroids, offsets=offsets, ids=order.astype(np.int64), nprobe=nprobe)
+
+	def _with_lists(self, labels: np.ndarray, ids: np.ndarray) -> "IVFIndex":
+		order = np.argsort(labels, kind="stable")
+		offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+		np.cumsum(np.bincount(labels, minlength=self.nlist), out=offsets[1:])
+		return IVFIndex(centroids=self.centroids, offsets=offsets, ids=ids[order].astype(np.int64), nprobe=self.nprobe)
+
+	def _labels(self) -> np.ndarray:
+		return np.repeat(np.arange(self.nlist, dtype=np.int64), np.diff(self.offsets))
+
+	def subset(self, keep: np.ndarray) -> "IVFIndex":
+		"""Index over the rows where ``keep`` is True, renumbered in order."""
+		new_id = np.cumsum(keep) - 1
+		ids = np.asarray(self.ids)
+		mask = keep[ids]
+		return self._with_lists(self._labels()[mask], new_id[ids[mask]])
+
+	def add(self, vectors: np.ndarray, first_id: int) -> "IVFIndex":
+		"""Index with ``vectors`` appended as rows ``first_id..``, using the existing centroids."""
+		if len(vectors) == 0:
+			return self
+		labels = np.concatenate([self._labels(), _assign(vectors, self.centroids)])
+		ids = np.concatenate([np.asarray(self.ids), np.arange(first_id, first_id + len(vectors), dtype=np.int64)])
+		return self._with_lists(labels, ids)
+
+	def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+		"""Row ids stored in the ``nprobe`` lists closest to ``query``."""
+		nprobe = max(1, min(self.nlist, int(nprobe or self.nprobe)))
+		cscores = self.centroids @ query
+		if nprobe < self.nlist:
+			probe = np.argpartition(-cscores, nprobe - 1)[:nprobe]
+		else:
+			probe = np.arange(self.nlist)
+		return np.concatenate([self.ids[self.offsets[c]: self.offsets[c + 1]] for c in probe])
+
+	def save(self, directory: Path) -> None:
+		# Replace files instead of rewriting them: open KBs may still map ivf_ids.npy
+		for name, arr in (("ivf_centroids", self.centroids), ("ivf_offsets", self.offsets), ("ivf_ids", self.ids)):
+			save_npy(directory / f"{name}.npy", arr)
+
+	@classmethod
+	def load(cls, directory: Path, nprobe: int = 8) -> Optional["IVFIndex"]:
+		try:
+			return cls(
+				centroids=np.load(directory / "ivf_centroids.npy"),
+				offsets=np.load(directory / "ivf_offsets.npy"),
+				ids=np.load(directory / "ivf_ids.npy", mmap_mode="r"),
+				nprobe=nprobe,
+			)
+		except Exception:
+			return None
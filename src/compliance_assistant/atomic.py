@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+import numpy as np
+
+try:
+	import fcntl  # type: ignore
+except ImportError:  # pragma: no cover  (Windows: in-process locking only)
+	fcntl = None  # type: ignore
+
+
+def _tmp_path(path: Path, suffix: str = "") -> Path:
+	# Unique per writer, so concurrent writers never share a temp file
+	return path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp{suffix}")
+
+
+def _replace(tmp: Path, path: Path) -> None:
+	try:
+		os.replace(tmp, path)
+	except BaseException:
+		tmp.unlink(missing_ok=True)
+		raise
+
+
+def write_bytes(path: Path, data: bytes) -> None:
+	"""Write ``data`` to ``path`` through a temp file and ``os.replace``.
+
+	Readers see the old or the new file, never a partial one; a file that
+	open KBs still have memory-mapped is replaced, not overwritten.
+	"""
+	tmp = _tmp_path(path)
+	try:
+		tmp.write_bytes(data)
+	except BaseException:
+		tmp.unlink(missing_ok=True)
+		raise
+	_replace(tmp, path)
+
+
+def save_npy(path: Path, arr: np.ndarray) -> None:
+	"""``np.save`` to ``path`` atomically (see ``write_bytes``)."""
+	tmp = _tmp_path(path, ".npy")
+	try:
+		np.save(tmp, arr)
+	except BaseException:
+		tmp.unlink(missing_ok=True)
+		raise
+	_replace(tmp, path)
+
+
+def savez(path: Path, **arrays: np.ndarray) -> None:
+	"""``np.savez`` to ``path`` atomically (see ``write_bytes``)."""
+	tmp = _tmp_path(path, ".npz")
+	try:
+		np.savez(tmp, **arrays)
+	except BaseException:
+		tmp.unlink(missing_ok=True)
+		raise
+	_replace(tmp, path)
+
+
+_LOCKS: Dict[str, threading.RLock] = {}
+_LOCKS_GUARD = threading.Lock()
+_HELD = threading.local()
+
+
+@contextmanager
+def directory_lock(directory: Path, shared: bool = False) -> Iterator[None]:
+	"""Exclusive lock on ``directory`` across threads and processes.
+
+	A per-directory thread lock plus an ``fcntl`` lock on ``<directory>/.lock``.
+	Reentrant within a thread, so a locked build may call another. With
+	``shared`` it is a reader's lock instead (other readers may hold it too,
+	in other processes) and it creates nothing: without a lock file there is
+	nothing to wait for.
+	"""
+	if shared:
+		if not (directory / ".lock").exists():
+			yield
+			return
+	else:
+		directory.mkdir(parents=True, exist_ok=True)
+	key = str(directory.resolve())
+	with _LOCKS_GUARD:
+		lock = _LOCKS.setdefault(key, threading.RLock())
+	with lock:
+		held = _HELD.__dict__.setdefault("dirs", set())
+		if key in held or fcntl is None:
+			yield
+			return
+		with open(directory / ".lock", "rb" if shared else "a+b") as f:
+			fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+			held.add(key)
+			try:
+				yield
+			finally:
+				held.discard(key)
+				fcntl.flock(f.fileno(), fcntl.LOCK_UN)
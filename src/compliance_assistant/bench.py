@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple
+
+from .analysis import DocumentAnalysis
+from .dates import extract_dates
+from .rules import CompiledRules
+from .scanner import PatternSet
+from .validate import DETECTORS
+
+
+@dataclass
+class RuleCost:
+	"""What one rule cost over a corpus."""
+	rule: str
+	seconds: float = 0.0
+	matches: int = 0
+	timeouts: int = 0
+	per_doc: List[Tuple[float, str]] = field(default_factory=list)  # (seconds, document)
+
+	def add(self, doc: str, seconds: float, matches: int, timed_out: bool = False) -> None:
+		self.seconds += seconds
+		self.matches += matches
+		self.timeouts += int(timed_out)
+		self.per_doc.append((seconds, doc))
+
+	def ms_per_mb(self, total_bytes: int) -> float:
+		return self.seconds * 1000 / max(total_bytes / (1024 * 1024), 1e-9)
+
+	def worst(self, k: int = 1) -> List[Tuple[float, str]]:
+		return sorted(self.per_doc, reverse=True)[:k]
+
+
+def _best_of(repeat: int, run: Callable[[object], object], setup: Callable[[], object] = lambda: None) -> Tuple[float, object]:
+	# Minimum over repeats; setup (e.g. a fresh DocumentAnalysis, whose caches
+	# would otherwise favour later runs) is not timed
+	best = float("inf")
+	result = None
+	for _ in range(max(1, repeat)):
+		arg = setup()
+		start = time.perf_counter()
+		result = run(arg)
+		best = min(best, time.perf_counter() - start)
+	return best, result
+
+
+def bench_rules(docs: List[Tuple[str, str]], rules: CompiledRules, repeat: int = 3) -> List[RuleCost]:
+	"""Time each detector and each placeholder pattern over ``docs``.
+
+	Detectors run exactly as in validation, each on a fresh DocumentAnalysis
+	so that one does not profit from another's caches; the shared groundwork
+	(lowercasing, line table, label scan) and date extraction are reported
+	as rows of their own. Placeholder patterns run one by one with the
+	literal pre-check and time budget they get in validation.
+	"""
+	costs = {
+		"analysis": RuleCost("analysis"),
+		"labels": RuleCost("labels"),
+		"dates": RuleCost("dates"),
+	}
+	for name, _ in DETECTORS:
+		costs[f"detector:{name}"] = RuleCost(f"detector:{name}")
+	singles = [PatternSet([p]) for p in rules.placeholder_patterns]
+	for i, p in enumerate(rules.placeholder_patterns):
+		costs[f"pattern:{i}"] = RuleCost(f"placeholder {p.pattern!r}")
+
+	for name, text in docs:
+		secs, doc = _best_of(repeat, lambda _: DocumentAnalysis(text))
+		costs["analysis"].add(name, secs, 0)
+		secs, present = _best_of(repeat, lambda _: rules.labels.find(doc.lower))
+		costs["labels"].add(name, secs, len(present))
+		secs, dates = _best_of(repeat, lambda _: extract_dates(text))
+		costs["dates"].add(name, secs, len(dates))
+		for det_name, detect in DETECTORS:
+			secs, found = _best_of(repeat, lambda d: detect(d, rules, present, []), lambda: DocumentAnalysis(text))
+			costs[f"detector:{det_name}"].add(name, secs, len(found))
+		for i, single in enumerate(singles):
+			secs, (hits, timed_out) = _best_of(repeat, lambda _: single.scan(text, doc.lower, rules.pattern_timeout))
+			costs[f"pattern:{i}"].add(name, secs, len(hits), bool(timed_out))
+	return list(costs.values())
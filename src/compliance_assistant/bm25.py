@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .atomic import savez, write_bytes
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+	"a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+	"shall may must not no any all such which who under than".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+	return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+@dataclass
+class BM25Index:
+	"""Okapi BM25 over a fixed list of documents, stored as CSR postings.
+
+	Postings for term ``t`` are ``doc_ids[indptr[v]:indptr[v+1]]`` (with matching
+	``tfs``) where ``v = vocab[t]``. A query only touches the postings of its own
+	terms, so it is cheap even for very large corpora.
+	"""
+	vocab: Dict[str, int]
+	indptr: np.ndarray   # (n_terms + 1,) int64
+	doc_ids: np.ndarray  # (n_postings,) int32
+	tfs: np.ndarray      # (n_postings,) float32
+	doc_len: np.ndarray  # (n_docs,) float32
+	k1: float = 1.5
+	b: float = 0.75
+
+	@property
+	def n_docs(self) -> int:
+		return len(self.doc_len)
+
+	@classmethod
+	def build(cls, docs: List[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+		postings: Dict[str, Dict[int, int]] = {}
+		doc_len = np.zeros(len(docs), dtype=np.float32)
+		for i, doc in enumerate(docs):
+			tokens = tokenize(doc)
+			doc_len[i] = len(tokens)
+			for t in tokens:
+				row = postings.setdefault(t, {})
+				row[i] = row.get(i, 0) + 1
+		vocab: Dict[str, int] = {}
+		indptr = [0]
+		ids: List[int] = []
+		tfs: List[int] = []
+		for t in sorted(postings):
+			vocab[t] = len(vocab)
+			row = postings[t]
+			ids.extend(row.keys())
+			tfs.extend(row.values())
+			indptr.append(len(ids))
+		return cls(
+			vocab=vocab,
+			indptr=np.asarray(indptr, dtype=np.int64),
+			doc_ids=np.asarray(ids, dtype=np.int32),
+			tfs=np.asarray(tfs, dtype=np.float32),
+			doc_len=doc_len,
+			k1=k1,
+			b=b,
+		)
+
+	def _terms(self) -> List[str]:
+		terms = [""] * len(self.vocab)
+		for t, v in self.vocab.items():
+			terms[v] = t
+		return terms
+
+	@classmethod
+	def _from_postings(cls, terms: List[str], term_of: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray, doc_len: np.ndarray, k1: float, b: float) -> "BM25Index":
+		order = np.argsort(term_of, kind="stable")
+		counts = np.bincount(term_of, minlength=len(terms))
+		alive = np.flatnonzero(counts)
+		indptr = np.zeros(len(alive) + 1, dtype=np.int64)
+		np.cumsum(counts[alive], out=indptr[1:])
+		return cls(
+			vocab={terms[v]: i for i, v in enumerate(alive)},
+			indptr=indptr,
+			doc_ids=doc_ids[order].astype(np.int32),
+			tfs=tfs[order].astype(np.float32),
+			doc_len=doc_len.astype(np.float32),
+			k1=k1,
+			b=b,
+		)
+
+	def _term_of(self) -> np.ndarray:
+		return np.repeat(np.arange(len(self.vocab), dtype=np.int64), np.diff(self.indptr))
+
+	def subset(self, keep: np.ndarray) -> "BM25Index":
+		"""Index over the documents where ``keep`` is True, renumbered in order."""
+		new_id = np.cumsum(keep) - 1
+		mask = keep[self.doc_ids]
+		return self._from_postings(
+			self._terms(),
+			self._term_of()[mask],
+			new_id[self.doc_ids[mask]],
+			self.tfs[mask],
+			self.doc_len[keep],
+			self.k1,
+			self.b,
+		)
+
+	def extend(self, docs: List[str]) -> "BM25Index":
+		"""Index with ``docs`` appended; only the new documents are tokenized."""
+		if not docs:
+			return self
+		extra = BM25Index.build(docs, self.k1, self.b)
+		terms = self._terms()
+		vocab = dict(self.vocab)
+		for t in extra._terms():
+			if t not in vocab:
+				vocab[t] = len(terms)
+				terms.append(t)
+		extra_rows = np.asarray([vocab[t] for t in extra._terms()], dtype=np.int64)
+		return self._from_postings(
+			terms,
+			np.concatenate([self._term_of(), extra_rows[extra._term_of()]]),
+			np.concatenate([self.doc_ids.astype(np.int64), extra.doc_ids.astype(np.int64) + self.n_docs]),
+			np.concatenate([self.tfs, extra.tfs]),
+			np.concatenate([self.doc_len, extra.doc_len]),
+			self.k1,
+			self.b,
+		)
+
+	def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+		"""Top-k (doc id, score) for ``query``, best first; empty when no term matches."""
+		if self.n_docs == 0 or k <= 0:
+			return []
+		rows = sorted({self.vocab[t] for t in tokenize(query) if t in self.vocab})
+		if not rows:
+			return []
+		avgdl = float(self.doc_len.mean()) or 1.0
+		ids_parts = []
+		weight_parts = []
+		for v in rows:
+			lo, hi = self.indptr[v], self.indptr[v + 1]
+			ids = self.doc_ids[lo:hi]
+			tf = self.tfs[lo:hi]
+			df = hi - lo
+			idf = math.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+			norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[ids] / avgdl)
+			ids_parts.append(ids)
+			weight_parts.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+		uniq, inverse = np.unique(np.concatenate(ids_parts), return_inverse=True)
+		scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+		kk = min(k, len(uniq))
+		top = np.argpartition(-scores, kk - 1)[:kk] if kk < len(uniq) else np.arange(len(uniq))
+		top = top[np.argsort(-scores[top], kind="stable")]
+		return [(int(uniq[i]), float(scores[i])) for i in top]
+
+	def save(self, directory: Path) -> None:
+		# Replace files instead of rewriting them, like every other index file
+		write_bytes(directory / "bm25_vocab.json", json.dumps(self.vocab).encode("utf-8"))
+		savez(
+			directory / "bm25_postings.npz",
+			indptr=self.indptr,
+			doc_ids=self.doc_ids,
+			tfs=self.tfs,
+			doc_len=self.doc_len,
+			params=np.asarray([self.k1, self.b], dtype=np.float64),
+		)
+
+	@classmethod
+	def load(cls, directory: Path) -> Optional["BM25Index"]:
+		try:
+			vocab = json.loads((directory / "bm25_vocab.json").read_text(encoding="utf-8"))
+			with np.load(directory / "bm25_postings.npz") as data:
+				return cls(
+					vocab=vocab,
+					indptr=data["indptr"],
+					doc_ids=data["doc_ids"],
+					tfs=data["tfs"],
+					doc_len=data["doc_len"],
+					k1=float(data["params"][0]),
+					b=float(data["params"][1]),
+				)
+		except Exception:
+			return None
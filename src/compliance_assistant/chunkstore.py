@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import mmap
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .atomic import savez, write_bytes
+
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def chunk_spans(data: bytes, max_len: int = 800, overlap: int = 0) -> List[Tuple[int, int]]:
+	"""Split ``data`` into line-aligned (start, end) byte spans.
+
+	Same boundaries as the original text chunker: a chunk closes once it holds
+	``max_len`` bytes of stripped text, or at a blank line once it is 70% full.
+	With ``overlap`` > 0 the next chunk starts with the trailing lines of the
+	previous one, up to ``overlap`` bytes.
+	"""
+	if overlap >= max_len:
+		overlap = max_len // 2
+	lines: List[Tuple[int, int]] = []  # stripped (start, end) per line; (-1, -1) for blank lines
+	pos = 0
+	n = len(data)
+	while pos <= n:
+		nl = data.find(b"\n", pos)
+		if nl == -1:
+			nl = n
+		raw = data[pos:nl]
+		stripped = raw.strip()
+		if stripped:
+			lo = pos + (len(raw) - len(raw.lstrip()))
+			lines.append((lo, lo + len(stripped)))
+		else:
+			lines.append((-1, -1))
+		pos = nl + 1
+
+	spans: List[Tuple[int, int]] = []
+	buf: List[Tuple[int, int]] = []
+	count = 0
+
+	def flush() -> None:
+		nonlocal buf, count
+		spans.append((buf[0][0], buf[-1][1]))
+		carry: List[Tuple[int, int]] = []
+		if overlap > 0:
+			size = 0
+			for ln in reversed(buf[1:]):
+				size += ln[1] - ln[0]
+				if size > overlap:
+					break
+				carry.insert(0, ln)
+		buf = carry
+		count = sum(e - s for s, e in carry)
+
+	for start, end in lines:
+		if start < 0:
+			# Close at a paragraph break, unless the buffer only holds overlap lines
+			if count > max_len * 0.7 and buf and (not spans or buf[-1][1] > spans[-1][1]):
+				flush()
+			continue
+		buf.append((start, end))
+		count += end - start
+		if count >= max_len:
+			flush()
+	if buf and (not spans or buf[-1][1] > spans[-1][1]):
+		spans.append((buf[0][0], buf[-1][1]))
+	return spans
+
+
+def span_text(data: Buffer, start: int, end: int) -> str:
+	"""Materialize a span as chunk text: decoded, lines joined by single spaces."""
+	return " ".join(bytes(data[start:end]).decode("utf-8", errors="ignore").split())
+
+
+@dataclass
+class ChunkLocation:
+	path: str
+	start: int       # byte offset in the source text
+	end: int
+	first_line: int  # 1-based
+	last_line: int
+
+	def __str__(self) -> str:
+		if self.first_line == self.last_line:
+			return f"{self.path}:{self.first_line}"
+		return f"{self.path}:{self.first_line}-{self.last_line}"
+
+
+class ChunkStore(Sequence[str]):
+	"""Chunks as (source, start, end) offsets into one concatenated corpus.
+
+	The corpus is normally a memory-mapped file, so chunk text is only
+	materialized (decoded and whitespace-collapsed) when it is accessed.
+	Line numbers are computed once at build time and stored with the offsets.
+	"""
+
+	def __init__(
+		self,
+		corpus: Buffer,
+		source: np.ndarray,
+		start: np.ndarray,
+		end: np.ndarray,
+		first_line: np.ndarray,
+		last_line: np.ndarray,
+		source_paths: List[str],
+		source_base: List[int],
+	) -> None:
+		self.corpus = corpus
+		self.source = source
+		self.start = start
+		self.end = end
+		self.first_line = first_line
+		self.last_line = last_line
+		self.source_paths = source_paths
+		self.source_base = source_base
+
+	def __len__(self) -> int:
+		return len(self.start)
+
+	def __getitem__(self, i):  # type: ignore[override]
+		if isinstance(i, slice):
+			return [self[j] for j in range(*i.indices(len(self)))]
+		return span_text(self.corpus, int(self.start[i]), int(self.end[i]))
+
+	def __iter__(self) -> Iterator[str]:
+		for i in range(len(self)):
+			yield self[i]
+
+	def location(self, i: int) -> ChunkLocation:
+		src = int(self.source[i])
+		base = self.source_base[src]
+		start, end = int(self.start[i]), int(self.end[i])
+		return ChunkLocation(self.source_paths[src], start - base, end - base, int(self.first_line[i]), int(self.last_line[i]))
+
+	def source_text(self, src: int) -> bytes:
+		"""Raw bytes of source ``src`` as stored in the corpus."""
+		base = self.source_base[src]
+		stop = self.source_base[src + 1] - 1 if src + 1 < len(self.source_base) else len(self.corpus) - 1
+		return bytes(self.corpus[base:stop])
+
+	def source_spans(self, src: int) -> List[Tuple[int, int]]:
+		"""Spans of source ``src``, relative to its own text."""
+		base = self.source_base[src]
+		sel = self.source == src
+		return [(int(s) - base, int(e) - base) for s, e in zip(self.start[sel], self.end[sel])]
+
+	@classmethod
+	def from_texts(
+		cls,
+		texts: List[Tuple[str, bytes]],
+		spans: List[List[Tuple[int, int]]],
+	) -> "ChunkStore":
+		"""Build an in-memory store from (path, text bytes) pairs and their spans."""
+		corpus, source, start, end, first, last, base = _concat(texts, spans)
+		return cls(corpus, source, start, end, first, last, [p for p, _ in texts], base)
+
+	def save(self, directory: Path) -> None:
+		write_bytes(directory / "corpus.txt", bytes(self.corpus))
+		savez(
+			directory / "chunks.npz",
+			source=self.source,
+			start=self.start,
+			end=self.end,
+			first_line=self.first_line,
+			last_line=self.last_line,
+			base=np.asarray(self.source_base, dtype=np.int64),
+		)
+
+	@classmethod
+	def load(cls, directory: Path, source_paths: List[str]) -> Optional["ChunkStore"]:
+		try:
+			with np.load(directory / "chunks.npz") as data:
+				source, start, end, base = data["source"], data["start"], data["end"], data["base"]
+				first, last = data["first_line"], data["last_line"]
+			with open(directory / "corpus.txt", "rb") as f:
+				size = f.seek(0, 2)
+				corpus: Buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+		except Exception:
+			return None
+		return cls(corpus, source, start, end, first, last, list(source_paths), [int(b) for b in base])
+
+
+def _concat(
+	texts: List[Tuple[str, bytes]],
+	spans: List[List[Tuple[int, int]]],
+) -> Tuple[bytes, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[int]]:
+	parts: List[bytes] = []
+	base: List[int] = []
+	source: List[int] = []
+	start: List[int] = []
+	end: List[int] = []
+	first: List[np.ndarray] = []
+	last: List[np.ndarray] = []
+	offset = 0
+	for si, ((_, data), src_spans) in enumerate(zip(texts, spans)):
+		base.append(offset)
+		parts.append(data)
+		for s, e in src_spans:
+			source.append(si)
+			start.append(offset + s)
+			end.append(offset + e)
+		if src_spans:
+			# 1-based line of a byte offset = newlines before it + 1
+			newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 0x0A)
+			bounds = np.asarray(src_spans, dtype=np.int64)
+			first.append(np.searchsorted(newlines, bounds[:, 0]) + 1)
+			last.append(np.searchsorted(newlines, bounds[:, 1]) + 1)
+		offset += len(data) + 1
+		parts.append(b"\n")
+	return (
+		b"".join(parts),
+		np.asarray(source, dtype=np.int32),
+		np.asarray(start, dtype=np.int64),
+		np.asarray(end, dtype=np.int64),
+		np.concatenate(first).astype(np.int32) if first else np.zeros(0, dtype=np.int32),
+		np.concatenate(last).astype(np.int32) if last else np.zeros(0, dtype=np.int32),
+		base,
+	)
@@ -1,5 +1,6 @@
 import json
 from pathlib import Path
+from typing import Optional
 
 import click
 
@@ -28,5 +29,121 @@ def main(file_path: Path, preview: int, as_json: bool) -> None:
 		click.echo("\n... (truncated) ...")
 
 
+class _DefaultToParse(click.Group):
+	# ``cli FILE`` keeps working as ``cli parse FILE``
+	def resolve_command(self, ctx, args):
+		if args and args[0] not in self.commands and not args[0].startswith("-"):
+			args = ["parse", *args]
+		return super().resolve_command(ctx, args)
+
+
+@click.group(cls=_DefaultToParse)
+def cli() -> None:
+	"""Compliance assistant command line tools."""
+
+
+cli.add_command(main, name="parse")
+
+
+@cli.group()
+def rules() -> None:
+	"""Inspect the validation rules (config/rules.yml)."""
+
+
+@rules.command("bench")
+@click.argument("corpus", type=click.Path(exists=True, path_type=Path))
+@click.option("--rules", "rules_path", type=click.Path(exists=True), default=None, help="rules.yml to profile [default: config/rules.yml]")
+@click.option("--repeat", type=int, default=3, show_default=True, help="Runs per rule and document; the fastest counts")
+@click.option("--worst", type=int, default=1, show_default=True, help="Slowest documents to list per rule")
+@click.option("--json", "as_json", is_flag=True, help="Output JSON instead of a table")
+def rules_bench(corpus: Path, rules_path: Optional[str], repeat: int, worst: int, as_json: bool) -> None:
+	"""Profile each detector and placeholder pattern over a corpus of documents.
+
+	CORPUS is a document or a directory searched recursively for .txt, .pdf
+	and .docx files. Rules are listed by cost per MB of text, highest first.
+	"""
+	from .bench import bench_rules
+	from .ingest import load_documents
+	from .rules import get_rules
+
+	compiled = get_rules(rules_path)
+	docs, failed = load_documents(corpus)
+	for msg in failed:
+		click.echo(f"skipped {msg}", err=True)
+	if not docs:
+		raise click.ClickException(f"No readable documents under {corpus}")
+	total = sum(len(text.encode("utf-8")) for _, text in docs)
+	costs = sorted(bench_rules(docs, compiled, repeat), key=lambda c: c.seconds, reverse=True)
+	if as_json:
+		click.echo(json.dumps({
+			"documents": len(docs),
+			"bytes": total,
+			"rule_errors": list(compiled.errors),
+			"rules": [
+				{
+					"rule": c.rule,
+					"ms_per_mb": round(c.ms_per_mb(total), 3),
+					"total_ms": round(c.seconds * 1000, 3),
+					"matches": c.matches,
+					"timeouts": c.timeouts,
+					"worst": [{"document": d, "ms": round(t * 1000, 3)} for t, d in c.worst(worst)],
+				}
+				for c in costs
+			],
+		}, ensure_ascii=False, indent=2))
+		return
+	click.echo(f"{len(docs)} documents, {total / (1024 * 1024):.2f} MB, best of {repeat}")
+	for err in compiled.errors:
+		click.echo(f"rule error: {err}")
+	width = max(len(c.rule) for c in costs)
+	click.echo(f"{'rule':<{width}}  {'ms/MB':>10}  {'total ms':>10}  {'matches':>8}  {'timeouts':>8}  worst")
+	for c in costs:
+		slow = ", ".join(f"{d} ({t * 1000:.2f} ms)" for t, d in c.worst(worst))
+		click.echo(f"{c.rule:<{width}}  {c.ms_per_mb(total):>10.2f}  {c.seconds * 1000:>10.2f}  {c.matches:>8}  {c.timeouts:>8}  {slow}")
+
+
+@cli.command("triage")
+@click.argument("corpus", type=click.Path(exists=True, path_type=Path))
+@click.option("--rules", "rules_path", type=click.Path(exists=True), default=None, help="rules.yml to apply [default: config/rules.yml]")
+@click.option("--min-score", type=int, default=None, help="Fail below this score [default: rules.yml triage.min_score]")
+@click.option("--json", "as_json", is_flag=True, help="Output one JSON object per document")
+def triage(corpus: Path, rules_path: Optional[str], min_score: Optional[int], as_json: bool) -> None:
+	"""Pass/fail screening of a document or directory of documents.
+
+	Deterministic checks only, cheapest first, stopping at the first
+	critical finding or once the score drops below the threshold. Exits
+	with status 1 if any document fails.
+	"""
+	from .ingest import load_documents
+	from .validate import triage_text
+
+	docs, failed = load_documents(corpus)
+	for msg in failed:
+		click.echo(f"skipped {msg}", err=True)
+	if not docs:
+		raise click.ClickException(f"No readable documents under {corpus}")
+	failures = 0
+	for name, text in docs:
+		result = triage_text(text, rules_path=rules_path, min_score=min_score)
+		failures += not result.passed
+		if as_json:
+			click.echo(json.dumps({
+				"document": name,
+				"passed": result.passed,
+				"reason": result.reason,
+				"score": result.score,
+				"checked": result.checked,
+				"errors": result.errors,
+			}, ensure_ascii=False))
+		else:
+			click.echo(f"{'PASS' if result.passed else 'FAIL'}  {name}  ({result.reason})")
+			for err in result.errors:
+				click.echo(f"  rule error: {err}")
+	if not as_json:
+		click.echo(f"{len(docs) - failures} passed, {failures} failed")
+	if failures:
+		raise SystemExit(1)
+
+
 if __name__ == "__main__":
-	main()
+	cli()
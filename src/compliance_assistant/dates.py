@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import datetime as _dt
+import re
+from dataclasses import dataclass
+from typing import List
+
+
+_MONTHS = {m: i for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+# One pass, leftmost match wins, so a year inside a full date is not reported again.
+# Full dates come first in the alternation; a bare year is the fallback.
+_DATE_RE = re.compile(
+	r"\b(?:"
+	r"(?P<iso_y>(?:19|20)\d{2})-(?P<iso_m>\d{2})-(?P<iso_d>\d{2})"
+	r"|(?P<dmy_d>\d{1,2})(?P<sep>[-/])(?P<dmy_m>\d{1,2}|[A-Za-z]{3})(?P=sep)(?P<dmy_y>(?:19|20)\d{2})"
+	r"|(?P<year>(?:19|20)\d{2})"
+	r")\b"
+)
+
+
+@dataclass(frozen=True)
+class DateMention:
+	start: int
+	end: int
+	text: str
+	date: _dt.date
+	kind: str  # "iso" (YYYY-MM-DD) | "dmy" (DD/MM/YYYY, DD-Mon-YYYY) | "year"
+
+
+def _build(m: "re.Match[str]") -> DateMention:
+	kind = m.lastgroup  # last group of the alternative that matched
+	try:
+		if kind == "iso_d":
+			d = _dt.date(int(m.group("iso_y")), int(m.group("iso_m")), int(m.group("iso_d")))
+			return DateMention(m.start(), m.end(), m.group(0), d, "iso")
+		if kind == "dmy_y":
+			month = m.group("dmy_m")
+			month_no = int(month) if month.isdigit() else _MONTHS.get(month.lower(), 0)
+			d = _dt.date(int(m.group("dmy_y")), month_no, int(m.group("dmy_d")))
+			return DateMention(m.start(), m.end(), m.group(0), d, "dmy")
+	except ValueError:
+		# Not a real calendar date: keep its year
+		group = "iso_y" if kind == "iso_d" else "dmy_y"
+		start = m.start(group)
+		return DateMention(start, start + 4, m.group(group), _dt.date(int(m.group(group)), 1, 1), "year")
+	return DateMention(m.start(), m.end(), m.group(0), _dt.date(int(m.group(0)), 1, 1), "year")
+
+
+def extract_dates(text: str) -> List[DateMention]:
+	"""Dates mentioned in ``text``, in order, with non-overlapping spans.
+
+	Recognizes ISO dates, day-first dates with ``/`` or ``-`` (numeric or
+	three-letter English month) and bare years 1900-2099. Dates are built
+	from the match groups directly.
+	"""
+	return [_build(m) for m in _DATE_RE.finditer(text)]
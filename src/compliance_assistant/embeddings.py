@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+	from openai import AzureOpenAI  # type: ignore
+except Exception:  # pragma: no cover
+	AzureOpenAI = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class Embedder(ABC):
+	"""Turns texts into a (len(texts), dim) float32 matrix."""
+
+	# Remote backends are called in token-budgeted, concurrent batches by embed_batched()
+	remote = False
+
+	@property
+	@abstractmethod
+	def model_id(self) -> str:
+		"""Stable identifier; vectors from different ids must never be mixed."""
+		raise NotImplementedError
+
+	@abstractmethod
+	def embed(self, texts: List[str]) -> np.ndarray:
+		raise NotImplementedError
+
+	def embed_strict(self, texts: List[str]) -> np.ndarray:
+		"""Like ``embed`` but raises on failure instead of returning fallback vectors."""
+		return self.embed(texts)
+
+
+@lru_cache(maxsize=1)
+def _azure_client():
+	# One client per process: building it per call costs a TLS/connection setup each time
+	if AzureOpenAI is None:
+		return None
+	api_key = os.getenv("AZURE_OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
+	endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+	api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
+	if not (api_key and endpoint):
+		return None
+	try:
+		return AzureOpenAI(api_key=api_key, azure_endpoint=endpoint, api_version=api_version)
+	except Exception:
+		# If client cannot be created (e.g., SDK mismatch), disable embeddings gracefully
+		return None
+
+
+class AzureEmbedder(Embedder):
+	remote = True
+
+	def __init__(self) -> None:
+		self.deployment = os.getenv("AZURE_OPENAI_EMBED_DEPLOYMENT", os.getenv("AZURE_OPENAI_EMBEDDINGS", "hackathon-em-group3"))
+
+	@property
+	def model_id(self) -> str:
+		return f"azure:{self.deployment}"
+
+	def embed(self, texts: List[str]) -> np.ndarray:
+		try:
+			return self.embed_strict(texts)
+		except Exception:
+			# Zero vectors carry no signal; the KB treats them as "no dense retrieval"
+			return np.zeros((len(texts), 10), dtype=np.float32)
+
+	def embed_strict(self, texts: List[str]) -> np.ndarray:
+		client = _azure_client()
+		if client is None or not texts:
+			return np.zeros((len(texts), 10), dtype=np.float32)
+		resp = client.embeddings.create(input=texts, model=self.deployment)
+		return np.asarray([d.embedding for d in resp.data], dtype=np.float32)
+
+
+class HashingEmbedder(Embedder):
+	"""Local, deterministic embedder: hashed character n-grams (feature hashing).
+
+	Texts are lowercased and whitespace-collapsed, every byte n-gram is hashed
+	into one of ``dim`` signed buckets, counts are log-scaled and rows are
+	L2-normalized. A whole batch is hashed with one set of NumPy operations.
+	"""
+
+	_MIX = np.uint64(0x9E3779B97F4A7C15)
+	_BASE = 0x100000001B3
+
+	def __init__(self, dim: Optional[int] = None, ngram_range: Tuple[int, int] = (3, 5)) -> None:
+		self.dim = int(dim or os.getenv("KB_HASH_DIM", "512"))
+		self.ngram_range = ngram_range
+		mask = (1 << 64) - 1
+		self._powers = {
+			n: np.asarray([pow(self._BASE, n - 1 - j, 1 << 64) & mask for j in range(n)], dtype=np.uint64)
+			for n in range(ngram_range[0], ngram_range[1] + 1)
+		}
+
+	@property
+	def model_id(self) -> str:
+		lo, hi = self.ngram_range
+		return f"hashing:char{lo}-{hi}:{self.dim}:v1"
+
+	def embed(self, texts: List[str]) -> np.ndarray:
+		if not texts:
+			return np.zeros((0, self.dim), dtype=np.float32)
+		encoded = [(" " + " ".join(t.lower().split()) + " ").encode("utf-8") for t in texts]
+		lengths = np.asarray([len(e) for e in encoded], dtype=np.int64)
+		data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+		doc_of = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+		keys = []
+		weights = []
+		with np.errstate(over="ignore"):
+			for n, powers in self._powers.items():
+				if len(data) < n:
+					continue
+				# Keep only windows that lie inside a single text
+				inside = doc_of[: len(data) - n + 1] == doc_of[n - 1:]
+				h = (sliding_window_view(data, n)[inside] * powers).sum(axis=1, dtype=np.uint64)
+				h = (h ^ np.uint64(n)) * self._MIX
+				h >>= np.uint64(32)
+				keys.append(doc_of[: len(data) - n + 1][inside] * self.dim + (h % np.uint64(self.dim)).astype(np.int64))
+				weights.append(np.where(h & np.uint64(1 << 31), -1.0, 1.0))
+		out = np.zeros((len(texts), self.dim), dtype=np.float32)
+		if keys:
+			counts = np.bincount(np.concatenate(keys), weights=np.concatenate(weights), minlength=len(texts) * self.dim)
+			out = counts.reshape(len(texts), self.dim).astype(np.float32)
+		out = np.sign(out) * np.log1p(np.abs(out))
+		norms = np.linalg.norm(out, axis=1, keepdims=True)
+		return (out / (norms + 1e-8)).astype(np.float32)
+
+
+def _estimate_tokens(text: str) -> int:
+	# ~4 characters per token for English prose; errs on the generous side
+	return len(text) // 4 + 1
+
+
+def _token_batches(texts: List[str], max_tokens: int, max_items: int) -> List[Tuple[int, int]]:
+	"""Split ``texts`` into consecutive [lo, hi) ranges under both budgets."""
+	batches: List[Tuple[int, int]] = []
+	lo = 0
+	used = 0
+	for i, text in enumerate(texts):
+		cost = _estimate_tokens(text)
+		if i > lo and (used + cost > max_tokens or i - lo >= max_items):
+			batches.append((lo, i))
+			lo, used = i, 0
+		used += cost
+	if lo < len(texts):
+		batches.append((lo, len(texts)))
+	return batches
+
+
+def _log_progress(total: int) -> Callable[[int, int], None]:
+	step = max(1, total // 10)
+	last = [0]
+
+	def report(done: int, total: int) -> None:
+		if done == total or done - last[0] >= step:
+			last[0] = done
+			logger.info("Embedded %d/%d chunks", done, total)
+	return report
+
+
+@dataclass
+class BatchEmbedding:
+	vectors: np.ndarray  # (n, dim); rows of failed texts are zero
+	failed: np.ndarray   # (n,) bool
+
+
+def embed_batched(
+	embedder: Embedder,
+	texts: List[str],
+	max_tokens: Optional[int] = None,
+	max_items: Optional[int] = None,
+	concurrency: Optional[int] = None,
+	retries: Optional[int] = None,
+	progress: Optional[Callable[[int, int], None]] = None,
+) -> BatchEmbedding:
+	"""Embed many texts, respecting per-request limits of remote providers.
+
+	Texts are packed into batches of at most ``max_tokens`` estimated tokens
+	and ``max_items`` inputs, sent on up to ``concurrency`` threads. A failing
+	batch is retried with backoff, then bisected and retried piece by piece,
+	so one bad input only costs its own vector. ``progress(done, total)`` is
+	called as batches complete (default: log every ~10%). Defaults come from KB_EMBED_BATCH_TOKENS
+	(8000), KB_EMBED_BATCH_ITEMS (256), KB_EMBED_CONCURRENCY (4) and
+	KB_EMBED_RETRIES (2). Local backends are called in sequential batches of
+	about KB_EMBED_LOCAL_BATCH_CHARS (1,000,000) characters, which bounds
+	their working memory.
+	"""
+	total = len(texts)
+	if progress is None:
+		progress = _log_progress(total)
+	if total == 0:
+		progress(0, 0)
+		return BatchEmbedding(vectors=np.zeros((0, 0), dtype=np.float32), failed=np.zeros(0, dtype=bool))
+	if not embedder.remote:
+		# Local backends build per-character work arrays; bound them per call
+		budget = int(os.getenv("KB_EMBED_LOCAL_BATCH_CHARS", "1000000"))
+		vectors = None
+		for lo, hi in _token_batches(texts, max(1, budget // 4), total):
+			vecs = np.asarray(embedder.embed(texts[lo:hi]), dtype=np.float32)
+			if vectors is None:
+				vectors = np.empty((total, vecs.shape[1]), dtype=np.float32)
+			vectors[lo:hi] = vecs
+			progress(hi, total)
+		return BatchEmbedding(vectors=vectors, failed=np.zeros(total, dtype=bool))
+	max_tokens = int(max_tokens or os.getenv("KB_EMBED_BATCH_TOKENS", "8000"))
+	max_items = int(max_items or os.getenv("KB_EMBED_BATCH_ITEMS", "256"))
+	concurrency = int(concurrency or os.getenv("KB_EMBED_CONCURRENCY", "4"))
+	retries = int(retries if retries is not None else os.getenv("KB_EMBED_RETRIES", "2"))
+
+	results: Dict[int, np.ndarray] = {}
+	failed = np.zeros(total, dtype=bool)
+	lock = threading.Lock()
+	done = 0
+
+	def attempt(lo: int, hi: int, tries: int) -> None:
+		nonlocal done
+		for n in range(tries + 1):
+			try:
+				vecs = np.asarray(embedder.embed_strict(texts[lo:hi]), dtype=np.float32)
+				if len(vecs) != hi - lo:
+					raise ValueError(f"Expected {hi - lo} embeddings, got {len(vecs)}")
+				break
+			except Exception as e:
+				if n < tries:
+					time.sleep(min(8.0, 0.5 * 2 ** n))
+					continue
+				if hi - lo > 1:
+					mid = (lo + hi) // 2
+					# Halves get a single try each: transient errors were already retried
+					attempt(lo, mid, 0)
+					attempt(mid, hi, 0)
+					return
+				logger.warning("Embedding failed for input %d: %s", lo, e)
+				with lock:
+					failed[lo] = True
+					done += 1
+					progress(done, total)
+				return
+		with lock:
+			for i, v in enumerate(vecs):
+				results[lo + i] = v
+			done += hi - lo
+			progress(done, total)
+
+	batches = _token_batches(texts, max_tokens, max_items)
+	with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as pool:
+		for fut in [pool.submit(attempt, lo, hi, retries) for lo, hi in batches]:
+			fut.result()
+	dim = next((len(v) for v in results.values()), 10)
+	vectors = np.zeros((total, dim), dtype=np.float32)
+	for i, v in results.items():
+		vectors[i] = v
+	return BatchEmbedding(vectors=vectors, failed=failed)
+
+
+_BACKENDS: Dict[str, Type[Embedder]] = {
+	"azure": AzureEmbedder,
+	"hashing": HashingEmbedder,
+}
+
+
+def register_embedder(name: str, cls: Type[Embedder]) -> None:
+	_BACKENDS[name.lower()] = cls
+	_embedder_for.cache_clear()
+
+
+def _resolve_backend(name: Optional[str]) -> str:
+	name = (name or "").strip().lower()
+	if name in ("", "auto"):
+		# A configured "auto" leaves the choice to the environment
+		name = (os.getenv("KB_EMBED_BACKEND") or "auto").strip().lower()
+	if name == "auto":
+		return "azure" if _azure_client() is not None else "hashing"
+	return name
+
+
+@lru_cache(maxsize=None)
+def _embedder_for(name: str) -> Embedder:
+	cls = _BACKENDS.get(name)
+	if not cls:
+		raise ValueError(f"Unknown embedding backend: {name} (available: {', '.join(sorted(_BACKENDS))})")
+	return cls()
+
+
+def get_embedder(name: Optional[str] = None) -> Embedder:
+	"""Return the embedder for ``name``.
+
+	``name`` (None or ``auto``) falls back to KB_EMBED_BACKEND, then
+	``auto``, which picks Azure when credentials are configured and the local
+	hashing embedder otherwise.
+	"""
+	return _embedder_for(_resolve_backend(name))
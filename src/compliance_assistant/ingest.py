@@ -1,10 +1,143 @@
 from __future__ import annotations
 
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
 
+from .chunkstore import chunk_spans
 from .parsers import ParserFactory, ParsedDocument
+from .parsers.txt_parser import TxtParser
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when parser output changes, so cached texts are re-extracted
+_TEXT_CACHE_VERSION = 1
+
+Spans = List[Tuple[int, int]]
+
+# Formats whose text extraction is worth a worker process
+_POOL_SUFFIXES = {".pdf", ".docx"}
 
 
 def ingest_file(file_path: str | Path) -> ParsedDocument:
 	parser = ParserFactory.for_file(file_path)
 	return parser.parse(file_path)
+
+
+def load_documents(path: Path) -> Tuple[List[Tuple[str, str]], List[str]]:
+	"""(name, text) for every supported file under ``path``, plus files that failed to parse."""
+	files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+	docs: List[Tuple[str, str]] = []
+	failed: List[str] = []
+	for f in files:
+		try:
+			parser = ParserFactory.for_file(f)
+		except ValueError:
+			continue  # unsupported file type
+		name = str(f.relative_to(path)) if f != path else f.name
+		try:
+			docs.append((name, parser.parse(f).text))
+		except Exception as e:
+			failed.append(f"{name}: {e}")
+	return docs, failed
+
+
+def _parse_text(path: Path) -> bytes:
+	try:
+		parser = ParserFactory.for_file(path)
+	except ValueError:
+		# Unknown extension: treat as plain text, as guideline files always were
+		parser = TxtParser()
+	return parser.parse(path).text.encode("utf-8")
+
+
+def prepare_source(
+	path: str,
+	sha: Optional[str],
+	cache_dir: Optional[str],
+	max_len: int,
+	overlap: int,
+) -> Tuple[bytes, Spans]:
+	"""Extract and chunk one guideline file: (text bytes, chunk spans).
+
+	Extracted text is cached under ``cache_dir`` by content hash, so PDFs are
+	only parsed once. A file that fails to parse yields no text (logged).
+	"""
+	cached = Path(cache_dir) / f"{sha}.v{_TEXT_CACHE_VERSION}.txt" if cache_dir and sha else None
+	data: Optional[bytes] = None
+	if cached is not None:
+		try:
+			data = cached.read_bytes()
+		except OSError:
+			data = None
+	if data is None:
+		try:
+			data = _parse_text(Path(path))
+		except Exception as e:
+			logger.warning("Could not extract text from %s: %s", path, e)
+			return b"", []
+		if cached is not None:
+			try:
+				tmp = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+				tmp.write_bytes(data)
+				os.replace(tmp, cached)
+			except OSError:
+				pass
+	return data, chunk_spans(data, max_len, overlap)
+
+
+def prepare_sources(
+	sources: Sequence[Tuple[str, Optional[str]]],
+	cache_dir: Optional[str],
+	max_len: int,
+	overlap: int,
+	workers: Optional[int] = None,
+) -> List[Tuple[bytes, Spans]]:
+	"""``prepare_source`` for many (path, sha256) pairs, in order.
+
+	PDF and DOCX extraction is CPU-bound, so when more than one such file
+	needs parsing and together they exceed KB_INGEST_POOL_MIN_BYTES (4 MB)
+	they go to a process pool; KB_INGEST_WORKERS caps it (default: CPU count,
+	1 disables it). Plain text, small batches and in-memory loads
+	(``cache_dir`` None) stay in-process, where starting workers would cost
+	more than it saves. Falls back to in-process parsing if the pool fails.
+	"""
+	workers = int(workers or os.getenv("KB_INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+	args = [(p, sha, cache_dir, max_len, overlap) for p, sha in sources]
+	heavy = [
+		i for i, a in enumerate(args)
+		if Path(a[0]).suffix.lower() in _POOL_SUFFIXES
+		and not (cache_dir and a[1] and (Path(cache_dir) / f"{a[1]}.v{_TEXT_CACHE_VERSION}.txt").exists())
+	]
+	results: List[Optional[Tuple[bytes, Spans]]] = [None] * len(args)
+	if cache_dir and workers > 1 and len(heavy) > 1 and _total_size(args[i][0] for i in heavy) >= _pool_min_bytes():
+		try:
+			# spawn, not fork: callers include the multithreaded KB writer thread
+			ctx = multiprocessing.get_context("spawn")
+			with ProcessPoolExecutor(max_workers=min(workers, len(heavy)), mp_context=ctx) as pool:
+				for i, res in zip(heavy, pool.map(prepare_source, *zip(*(args[i] for i in heavy)))):
+					results[i] = res
+		except Exception as e:
+			logger.warning("Parallel ingestion failed, parsing in-process: %s", e)
+	return [res if res is not None else prepare_source(*a) for res, a in zip(results, args)]
+
+
+def _pool_min_bytes() -> int:
+	try:
+		return int(os.getenv("KB_INGEST_POOL_MIN_BYTES", str(4 * 1024 * 1024)))
+	except ValueError:
+		return 4 * 1024 * 1024
+
+
+def _total_size(paths) -> int:
+	total = 0
+	for p in paths:
+		try:
+			total += os.path.getsize(p)
+		except OSError:
+			pass
+	return total
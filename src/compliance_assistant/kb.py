@@ -1,93 +1,753 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
-try:
-	from openai import AzureOpenAI  # type: ignore
-except Exception:  # pragma: no cover
-	AzureOpenAI = None  # type: ignore
+import numpy as np
+
+from .ann import IVFIndex
+from .atomic import directory_lock, save_npy, write_bytes
+from .bm25 import BM25Index
+from .chunkstore import ChunkLocation, ChunkStore, chunk_spans, span_text
+from .embeddings import Embedder, embed_batched, get_embedder
+from .ingest import prepare_sources
+from .quantize import VECTOR_DTYPES, QuantizedVectors
 
 
 def _chunk(text: str, max_len: int = 800) -> List[str]:
-	parts: List[str] = []
-	buf: List[str] = []
-	count = 0
-	for line in text.splitlines():
-		line = line.strip()
-		if not line:
-			if count > max_len * 0.7:
-				parts.append(" ".join(buf))
-				buf, count = [], 0
-			continue
-		buf.append(line)
-		count += len(line)
-		if count >= max_len:
-			parts.append(" ".join(buf))
-			buf, count = [], 0
-	if buf:
-		parts.append(" ".join(buf))
-	return parts
+	data = text.encode("utf-8")
+	return [span_text(data, s, e) for s, e in chunk_spans(data, max_len)]
+
+
+def _normalize_rows(mat: np.ndarray) -> np.ndarray:
+	"""Return a contiguous float32 copy of ``mat`` with unit-length rows (zero rows stay zero)."""
+	mat = np.asarray(mat, dtype=np.float32)
+	if mat.ndim == 1:
+		mat = mat.reshape(1, -1)
+	norms = np.linalg.norm(mat, axis=1, keepdims=True)
+	return np.ascontiguousarray(mat / (norms + 1e-8), dtype=np.float32)
+
+
+def _empty_vectors(embedder: Embedder) -> np.ndarray:
+	"""Vector matrix of a KB without chunks (width 0 when the backend's is unknown)."""
+	return np.zeros((0, int(getattr(embedder, "dim", 0) or 0)), dtype=np.float32)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+	"""Indices of the k highest scores, best first, without sorting the full array."""
+	k = min(k, scores.shape[-1])
+	if k <= 0:
+		return np.zeros(0, dtype=np.int64)
+	if k < scores.shape[-1]:
+		idx = np.argpartition(-scores, k - 1)[:k]
+	else:
+		idx = np.arange(scores.shape[-1])
+	return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _fit_dim(qmat: np.ndarray, dim: int) -> np.ndarray:
+	"""Truncate or zero-pad query rows to ``dim`` (dot product over the shared prefix)."""
+	if qmat.shape[1] == dim:
+		return qmat
+	if qmat.shape[1] > dim:
+		return np.ascontiguousarray(qmat[:, :dim])
+	out = np.zeros((qmat.shape[0], dim), dtype=np.float32)
+	out[:, :qmat.shape[1]] = qmat
+	return out
 
 
 @dataclass
 class KB:
-	chunks: List[str]
-	embed: List[List[float]]
+	chunks: Sequence[str]  # ChunkStore (lazy, offset-backed) or a plain list
+	embed: np.ndarray  # (n_chunks, dim) float32, rows L2-normalized
 	paths: List[str]
+	ann: Optional[IVFIndex] = None  # approximate search; exhaustive scan when None
+	bm25: Optional[BM25Index] = None  # lexical candidate pre-filter
+	dense: bool = True  # False when the vectors carry no signal (e.g. failed embedding calls)
+	embedder: Optional[Embedder] = None  # backend the vectors were built with; queries must match
+	quant: Optional[QuantizedVectors] = None  # compact float16/int8 copy used for scanning
+	citations: Dict[str, int] = field(default_factory=dict)  # precomputed message -> chunk id
+	root: Optional[Path] = None  # index directory when the KB is persisted
+	stamp: Optional[str] = None  # digest of the manifest this KB was opened from
+
+	def _rank(self, ids: np.ndarray, scores: np.ndarray, q: np.ndarray, k: int) -> List[Tuple[float, int]]:
+		"""Top-k of candidate rows ``ids`` given their (possibly quantized) scores.
+
+		With quantized scanning, the best ``k * KB_RERANK_FACTOR`` candidates are
+		re-scored exactly against the float32 matrix before the final cut.
+		"""
+		factor = int(os.getenv("KB_RERANK_FACTOR", "4"))
+		if self.quant is not None and factor > 0:
+			top = np.sort(ids[_top_k(scores, k * factor)])
+			exact = np.asarray(self.embed[top]) @ q
+			return [(float(exact[j]), int(top[j])) for j in _top_k(exact, k)]
+		return [(float(scores[j]), int(ids[j])) for j in _top_k(scores, k)]
+
+	def _score_rows(self, ids: np.ndarray, q: np.ndarray) -> np.ndarray:
+		if self.quant is not None:
+			return self.quant.take_dot(ids, q)
+		return np.asarray(self.embed[ids]) @ q
+
+	def _search(self, qmat: np.ndarray, k: int) -> List[List[Tuple[float, int]]]:
+		# Cosine similarity is a plain dot product because both sides are normalized
+		if self.ann is not None:
+			results = []
+			for q in qmat:
+				ids = np.sort(self.ann.candidates(q))
+				results.append(self._rank(ids, self._score_rows(ids, q), q, k) if len(ids) else [])
+			return results
+		scores = self.quant.dot(qmat) if self.quant is not None else qmat @ self.embed.T
+		all_ids = np.arange(len(self.chunks))
+		return [self._rank(all_ids, row, q, k) for row, q in zip(scores, qmat)]
 
 	def similar(self, query: str, k: int = 3) -> List[Tuple[float, str]]:
-		if not self.embed:
+		if not self.chunks:
 			return []
-		qv = _embed_texts([query])[0]
-		# cosine similarity
-		def cos(a: List[float], b: List[float]) -> float:
-			import math
-			n = min(len(a), len(b))
-			dot = sum(a[i] * b[i] for i in range(n))
-			norm = (math.sqrt(sum(x*x for x in a[:n])) * math.sqrt(sum(x*x for x in b[:n])) + 1e-8)
-			return dot / norm
-		scores = [(cos(qv, v), self.chunks[i]) for i, v in enumerate(self.embed)]
-		scores.sort(key=lambda x: x[0], reverse=True)
-		return scores[:k]
-
-
-def _client():
-	if AzureOpenAI is None:
+		return self.similar_many([query], k=k)[0]
+
+	def similar_many(self, queries: List[str], k: int = 3) -> List[List[Tuple[float, str]]]:
+		"""Top-k (score, chunk text) for each query; see ``search_many``."""
+		return [[(sc, self.chunks[i]) for sc, i in hits] for hits in self.search_many(queries, k)]
+
+	def precompute_citations(self, messages: Sequence[str], persist: bool = True) -> None:
+		"""Resolve and store the best chunk for each of ``messages``.
+
+		Meant for finding messages that rules generate from fixed templates, so
+		validation can cite them with a dictionary lookup. Messages already in
+		the table are skipped; new entries are persisted with the index unless
+		``persist`` is False.
+		"""
+		missing = [m for m in dict.fromkeys(messages) if m not in self.citations]
+		if not missing or not self.chunks:
+			return
+		table = dict(self.citations)
+		for msg, hits in zip(missing, self.search_many(missing, k=1)):
+			if hits:
+				table[msg] = hits[0][1]
+		self.citations = table
+		if persist and self.root is not None:
+			# Stamped, so a KB opened from an older index can't hand its chunk ids to a newer one
+			payload = {"mode": _retrieval_mode(), "stamp": self.stamp, "table": table}
+			try:
+				write_bytes(self.root / "citations.json", json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+			except OSError:
+				pass
+
+	def location(self, i: int) -> Optional[ChunkLocation]:
+		"""Source file and line range of chunk ``i`` when chunks are offset-backed."""
+		if isinstance(self.chunks, ChunkStore):
+			return self.chunks.location(i)
 		return None
-	api_key = os.getenv("AZURE_OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
-	endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-	api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
-	if not (api_key and endpoint):
+
+	def search_many(self, queries: List[str], k: int = 3) -> List[List[Tuple[float, int]]]:
+		"""Top-k (score, chunk id) for each query; all queries are embedded in one call.
+
+		In ``hybrid`` mode (default, see KB_RETRIEVAL) BM25 pre-selects candidates
+		and only those are re-ranked by embedding similarity; queries without any
+		lexical match fall back to a dense search. Without usable embeddings the
+		BM25 ranking is returned as-is; the same goes for single queries whose
+		embedding failed (an all-zero row), which have no dense result at all
+		when BM25 found nothing either.
+		"""
+		if not queries:
+			return []
+		if not self.chunks:
+			return [[] for _ in queries]
+		mode = _retrieval_mode()
+		lexical: Optional[List[List[Tuple[int, float]]]] = None
+		if self.bm25 is not None and mode != "dense":
+			n_cand = k if mode == "lexical" or not self.dense else max(k, int(os.getenv("KB_RERANK_CANDIDATES", "50")))
+			lexical = [self.bm25.search(q, n_cand) for q in queries]
+		if lexical is not None and (mode == "lexical" or not self.dense):
+			return [[(sc, i) for i, sc in hits[:k]] for hits in lexical]
+
+		embedder = self.embedder or get_embedder()
+		qmat = _fit_dim(_normalize_rows(embedder.embed(list(queries))), self.embed.shape[1])
+		embedded = np.any(qmat, axis=1)
+		hits: List[List[Tuple[float, int]]] = [[] for _ in queries]
+		full = [qi for qi in range(len(queries)) if embedded[qi]]
+		if lexical is not None:
+			full = []
+			for qi, cands in enumerate(lexical):
+				if not embedded[qi]:
+					hits[qi] = [(sc, i) for i, sc in cands[:k]]
+					continue
+				if not cands:
+					full.append(qi)
+					continue
+				ids = np.sort(np.asarray([i for i, _ in cands], dtype=np.int64))
+				hits[qi] = self._rank(ids, self._score_rows(ids, qmat[qi]), qmat[qi], k)
+		if full:
+			for qi, res in zip(full, self._search(qmat[full], k)):
+				hits[qi] = res
+		return hits
+
+
+def _retrieval_mode() -> str:
+	mode = os.getenv("KB_RETRIEVAL", "hybrid").lower()
+	return mode if mode in ("hybrid", "dense", "lexical") else "hybrid"
+
+
+def _prepare(sources: List[Tuple[str, Optional[str]]], root: Optional[Path] = None) -> List[Tuple[bytes, List[Tuple[int, int]]]]:
+	"""Text and chunk spans per (path, sha256), parsed in parallel (see ingest.prepare_sources)."""
+	cache_dir = None
+	if root is not None:
+		cache_dir = root / "texts"
+		cache_dir.mkdir(parents=True, exist_ok=True)
+	return prepare_sources(sources, str(cache_dir) if cache_dir else None, _CHUNK_MAX_LEN, _chunk_overlap())
+
+
+def _chunk_overlap() -> int:
+	return max(0, min(int(os.getenv("KB_CHUNK_OVERLAP", "0")), _CHUNK_MAX_LEN // 2))
+
+
+def _chunking() -> dict:
+	return {"max_len": _CHUNK_MAX_LEN, "overlap": _chunk_overlap()}
+
+
+def load_guidelines(paths: List[str], backend: Optional[str] = None) -> KB:
+	"""Build a KB in memory without touching the on-disk index."""
+	present = [str(p) for p in paths if Path(p).exists()]
+	prepared = _prepare([(p, None) for p in present])
+	texts = [(p, data) for p, (data, _) in zip(present, prepared)]
+	spans = [src_spans for _, src_spans in prepared]
+	store = ChunkStore.from_texts(texts, spans)
+	all_chunks = list(store)
+	embedder = get_embedder(backend)
+	if all_chunks:
+		vectors = _normalize_rows(embed_batched(embedder, all_chunks).vectors)
+	else:
+		vectors = _empty_vectors(embedder)
+	return KB(
+		chunks=store,
+		embed=vectors,
+		paths=[str(p) for p in paths],
+		bm25=BM25Index.build(all_chunks),
+		dense=bool(np.any(vectors)),
+		embedder=embedder,
+	)
+
+
+# --- Persistent KB index ---------------------------------------------------
+#
+# Layout of the index directory:
+#   manifest.json          sources (path, sha256, chunk count) + embedding model
+#   corpus.txt             all source texts concatenated, memory-mapped on load
+#   texts/<sha>.v*.txt     per-file cache of extracted text (PDF/DOCX/TXT via ParserFactory)
+#   chunks.npz             per chunk: source id and start/end byte offsets in corpus.txt
+#   vectors.npy            float32 matrix (n_chunks x dim), rows L2-normalized,
+#                          memory-mapped on load
+#   segments/<key>.npy     per-source cache (raw vectors) keyed by content hash,
+#                          embedding model and chunking parameters
+#   vectors_q.npy          optional float16/int8 copy scanned instead of vectors.npy
+#   vectors_scale.npy      per-row scales for int8
+#   ivf_*.npy              optional IVF (approximate nearest neighbour) index
+#   bm25_*                 BM25 inverted index used to pre-filter citation candidates
+#   citations.json         precomputed citations for rule-template finding messages
+#
+# Only sources whose content hash is missing from segments/ are re-embedded.
+#
+# ANN tuning (environment):
+#   KB_ANN              auto (default) | on | off
+#   KB_ANN_MIN_CHUNKS   chunk count at which "auto" builds the index (20000)
+#   KB_ANN_NLIST        number of IVF lists; 0 = ~4*sqrt(n_chunks)
+#   KB_ANN_NPROBE       lists scanned per query (8); higher = better recall
+#
+# Retrieval (environment):
+#   KB_RETRIEVAL           hybrid (default) | dense | lexical
+#   KB_RERANK_CANDIDATES   BM25 candidates re-ranked by embeddings in hybrid mode (50)
+#   KB_EMBED_BACKEND       auto (default) | azure | hashing, see embeddings.py
+#
+# Embedding requests (environment, remote backends only):
+#   KB_EMBED_BATCH_TOKENS  estimated tokens per request (8000)
+#   KB_EMBED_BATCH_ITEMS   inputs per request (256)
+#   KB_EMBED_CONCURRENCY   requests in flight (4)
+#   KB_EMBED_RETRIES       retries per batch before splitting it (2)
+#
+# Vector storage (environment):
+#   KB_VECTOR_DTYPE    float32 (default) | float16 | int8 for the scanned copy
+#   KB_RERANK_FACTOR   with float16/int8, re-score the best k*factor exactly (4; 0 = off)
+#
+# Ingestion (environment):
+#   KB_INGEST_WORKERS  processes used to parse PDF/DOCX files (CPU count; 1 = in-process)
+#   KB_INGEST_POOL_MIN_BYTES  PDF/DOCX bytes to parse before workers are started (4 MB)
+#
+# Chunking (environment):
+#   KB_CHUNK_OVERLAP   bytes of trailing lines repeated at the start of the next chunk (0)
+
+INDEX_DIR = os.getenv("KB_INDEX_DIR", "kb_index")
+_CHUNK_MAX_LEN = 800
+_SEGMENT_VERSION = 3
+_INDEX_VERSION = 6  # 6: per-chunk line numbers in chunks.npz
+
+# In-process cache: (index_dir, embedding model, paths, persist) -> (file stats, KB)
+_LOADED: Dict[Tuple[str, str, Tuple[str, ...], bool], Tuple[Tuple[Tuple[int, int], ...], KB]] = {}
+
+
+def _ann_settings(n_chunks: int) -> Optional[dict]:
+	"""Build-time ANN parameters for a KB of ``n_chunks``, or None for exhaustive search."""
+	mode = os.getenv("KB_ANN", "auto").lower()
+	if n_chunks == 0 or mode == "off":
+		return None
+	if mode != "on" and n_chunks < int(os.getenv("KB_ANN_MIN_CHUNKS", "20000")):
 		return None
+	nlist = int(os.getenv("KB_ANN_NLIST", "0")) or int(round(4 * n_chunks ** 0.5))
+	return {"type": "ivf", "nlist": max(1, min(nlist, n_chunks))}
+
+
+def _vector_dtype() -> str:
+	dtype = os.getenv("KB_VECTOR_DTYPE", "float32").lower()
+	return dtype if dtype in VECTOR_DTYPES else "float32"
+
+
+def _file_hash(path: Path) -> str:
+	h = hashlib.sha256()
+	with path.open("rb") as f:
+		for block in iter(lambda: f.read(1 << 20), b""):
+			h.update(block)
+	return h.hexdigest()
+
+
+def _segment_key(sha: str, model: str) -> str:
+	params = f"{sha}|{model}|{_CHUNK_MAX_LEN}|{_chunk_overlap()}|{_SEGMENT_VERSION}"
+	return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+
+def _read_manifest(index_dir: Path) -> Optional[dict]:
+	try:
+		return json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
+	except Exception:
+		return None
+
+
+def _load_segment(seg_dir: Path, key: str, n_chunks: int) -> Optional[np.ndarray]:
 	try:
-		return AzureOpenAI(api_key=api_key, azure_endpoint=endpoint, api_version=api_version)
+		vectors = np.load(seg_dir / f"{key}.npy")
 	except Exception:
-		# If client cannot be created (e.g., SDK mismatch), disable embeddings gracefully
 		return None
+	return vectors if len(vectors) == n_chunks else None
+
+
+def _source_vectors(
+	seg_dir: Path,
+	items: List[Tuple[str, bytes, List[Tuple[int, int]]]],
+	embedder: Embedder,
+	progress: Optional[Callable[[int, int], None]] = None,
+) -> List[np.ndarray]:
+	"""Raw vectors per (sha256, text, spans) source, from the segment cache or freshly embedded.
+
+	Chunks of all uncached sources go through one ``embed_batched`` call, so
+	batches are filled across files and sent concurrently.
+	"""
+	out: List[Optional[np.ndarray]] = []
+	missing: List[int] = []
+	texts: List[str] = []
+	for sha, data, spans in items:
+		seg = _load_segment(seg_dir, _segment_key(sha, embedder.model_id), len(spans))
+		out.append(seg)
+		if seg is None:
+			missing.append(len(out) - 1)
+			texts.extend(span_text(data, s, e) for s, e in spans)
+	if missing:
+		result = embed_batched(embedder, texts, progress=progress)
+		vectors = result.vectors
+		cached_dims = {seg.shape[1] for seg in out if seg is not None and seg.ndim == 2}
+		if result.failed.all() and cached_dims:
+			# Nothing came back; keep the matrix shape of the cached sources
+			vectors = np.zeros((len(texts), cached_dims.pop()), dtype=np.float32)
+		pos = 0
+		for i in missing:
+			sha, _, spans = items[i]
+			seg = vectors[pos: pos + len(spans)]
+			failed = result.failed[pos: pos + len(spans)]
+			pos += len(spans)
+			# Zero rows stand in for failed inputs; cache only complete sources
+			if not failed.any() and np.any(seg):
+				save_npy(seg_dir / f"{_segment_key(sha, embedder.model_id)}.npy", seg)
+			out[i] = seg
+	return [seg for seg in out if seg is not None]
+
+
+def _ann_matches(cfg: Optional[dict], n_chunks: int) -> bool:
+	"""Whether a persisted ANN config is still acceptable for ``n_chunks``.
+
+	An automatically sized IVF index stays valid while the corpus grows or
+	shrinks within a factor of four, so incremental updates don't force a
+	re-clustering on every change.
+	"""
+	want = _ann_settings(n_chunks)
+	if not cfg or not want:
+		return cfg == want
+	if os.getenv("KB_ANN_NLIST"):
+		return cfg == want
+	return want["nlist"] / 2 <= cfg["nlist"] <= want["nlist"] * 2
+
+
+def _manifest_compatible(manifest: Optional[dict], root: Path, model: str) -> bool:
+	"""Whether the persisted index was built with the current settings (sources aside)."""
+	return bool(
+		manifest
+		and manifest.get("version") == _INDEX_VERSION
+		and manifest.get("model") == model
+		and _ann_matches(manifest.get("ann"), sum(int(s.get("chunks", 0)) for s in manifest.get("sources", [])))
+		and manifest.get("vector_dtype", "float32") == _vector_dtype()
+		and manifest.get("chunking") == _chunking()
+		and (root / "vectors.npy").exists()
+		and (root / "corpus.txt").exists()
+	)
+
+
+def _write_manifest(root: Path, manifest: dict) -> None:
+	# Written last; the old one is removed before any other file is replaced, so a
+	# crash mid-write never leaves a manifest describing half-written files
+	write_bytes(root / "manifest.json", json.dumps(manifest, indent=2).encode("utf-8"))
+
+
+def _invalidate_manifest(root: Path) -> None:
+	for name in ("manifest.json", "citations.json"):
+		try:
+			(root / name).unlink()
+		except FileNotFoundError:
+			pass
 
 
-def _embed_texts(texts: List[str]) -> List[List[float]]:
-	client = _client()
-	if client is None:
-		return [[0.0] * 10 for _ in texts]
+def _manifest_stamp(manifest: dict) -> str:
+	return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _load_citations(root: Path, n_chunks: int, stamp: str) -> Dict[str, int]:
 	try:
-		deployment = os.getenv("AZURE_OPENAI_EMBED_DEPLOYMENT", os.getenv("AZURE_OPENAI_EMBEDDINGS", "hackathon-em-group3"))
-		resp = client.embeddings.create(input=texts, model=deployment)
-		return [d.embedding for d in resp.data]
+		payload = json.loads((root / "citations.json").read_text(encoding="utf-8"))
 	except Exception:
-		return [[0.0] * 10 for _ in texts]
+		return {}
+	if payload.get("mode") != _retrieval_mode() or payload.get("stamp") != stamp:
+		return {}
+	return {str(m): int(i) for m, i in payload.get("table", {}).items() if 0 <= int(i) < n_chunks}
+
+
+def _open_index(index_dir: Path, manifest: dict, embedder: Embedder) -> KB:
+	paths = [s["path"] for s in manifest["sources"]]
+	chunks = ChunkStore.load(index_dir, paths)
+	if chunks is None:
+		raise FileNotFoundError(f"KB chunk store missing or unreadable in {index_dir}")
+	vectors = np.load(index_dir / "vectors.npy", mmap_mode="r")
+	ann = None
+	if manifest.get("ann"):
+		ann = IVFIndex.load(index_dir, nprobe=int(os.getenv("KB_ANN_NPROBE", "8")))
+	quant = None
+	if manifest.get("vector_dtype", "float32") != "float32":
+		quant = QuantizedVectors.load(index_dir, manifest["vector_dtype"])
+	stamp = _manifest_stamp(manifest)
+	return KB(
+		chunks=chunks,
+		embed=vectors,
+		paths=paths,
+		ann=ann,
+		bm25=BM25Index.load(index_dir),
+		dense=bool(manifest.get("dense", True)),
+		embedder=embedder,
+		quant=quant,
+		citations=_load_citations(index_dir, len(chunks), stamp),
+		root=index_dir,
+		stamp=stamp,
+	)
+
+
+def build_index(
+	paths: List[str],
+	index_dir: Optional[str] = None,
+	backend: Optional[str] = None,
+	progress: Optional[Callable[[int, int], None]] = None,
+) -> KB:
+	"""Build (or refresh) the on-disk KB index for ``paths`` and open it.
+
+	Sources whose content hash and embedding model match the manifest are used
+	as-is; changed or new sources are re-chunked and re-embedded, everything
+	else comes from the per-source segment cache. ``backend`` selects the
+	embedder (see ``embeddings.get_embedder``); switching it rebuilds vectors.
+	``progress(done, total)`` receives embedding progress for uncached chunks.
+	Builds and updates of one index directory are serialized (see
+	atomic.directory_lock), across threads and processes.
+	"""
+	root = Path(index_dir or INDEX_DIR)
+	with directory_lock(root):
+		return _build_index(paths, root, backend, progress)
 
 
-def load_guidelines(paths: List[str]) -> KB:
-	all_chunks: List[str] = []
+def _build_index(
+	paths: List[str],
+	root: Path,
+	backend: Optional[str],
+	progress: Optional[Callable[[int, int], None]],
+) -> KB:
+	seg_dir = root / "segments"
+	seg_dir.mkdir(parents=True, exist_ok=True)
+	embedder = get_embedder(backend)
+	model = embedder.model_id
+	sources = []
 	for p in paths:
+		path = Path(p)
+		if path.exists():
+			sources.append({"path": str(p), "sha256": _file_hash(path)})
+
+	manifest = _read_manifest(root)
+	if (
+		_manifest_compatible(manifest, root, model)
+		and [(s["path"], s["sha256"]) for s in manifest["sources"]] == [(s["path"], s["sha256"]) for s in sources]
+	):
+		return _open_index(root, manifest, embedder)
+
+	texts: List[Tuple[str, bytes]] = []
+	spans: List[List[Tuple[int, int]]] = []
+	pending: List[Tuple[str, bytes, List[Tuple[int, int]]]] = []
+	indexed: List[dict] = []
+	prepared = _prepare([(src["path"], src["sha256"]) for src in sources], root)
+	for src, (data, src_spans) in zip(sources, prepared):
+		if not data:
+			continue  # failed to parse (logged); not recorded, so the next build retries it
+		indexed.append(src)
+		texts.append((src["path"], data))
+		spans.append(src_spans)
+		src["chunks"] = len(src_spans)
+		if src_spans:
+			pending.append((src["sha256"], data, src_spans))
+	all_vectors = _source_vectors(seg_dir, pending, embedder, progress)
+	vectors = np.concatenate(all_vectors) if all_vectors else _empty_vectors(embedder)
+	store = ChunkStore.from_texts(texts, spans)
+	vectors = _normalize_rows(vectors)
+	ann_cfg = _ann_settings(len(store))
+	ann = IVFIndex.build(vectors, nlist=ann_cfg["nlist"]) if ann_cfg and vectors.size else None
+	dtype = _vector_dtype()
+	quant = QuantizedVectors.quantize(vectors, dtype) if dtype != "float32" else None
+	return _persist(root, embedder, indexed, store, vectors, BM25Index.build(list(store)), ann, ann_cfg, quant)
+
+
+def _persist(
+	root: Path,
+	embedder: Embedder,
+	sources: List[dict],
+	store: ChunkStore,
+	vectors: np.ndarray,
+	bm25: BM25Index,
+	ann: Optional[IVFIndex],
+	ann_cfg: Optional[dict],
+	quant: Optional[QuantizedVectors],
+) -> KB:
+	_invalidate_manifest(root)
+	store.save(root)
+	save_npy(root / "vectors.npy", vectors)
+	if ann is not None:
+		ann.save(root)
+	if quant is not None:
+		quant.save(root)
+	bm25.save(root)
+	manifest = {
+		"version": _INDEX_VERSION,
+		"model": embedder.model_id,
+		"sources": sources,
+		"ann": ann_cfg,
+		"dense": bool(np.any(vectors)),
+		"vector_dtype": quant.dtype if quant is not None else "float32",
+		"chunking": _chunking(),
+	}
+	_write_manifest(root, manifest)
+	return _open_index(root, manifest, embedder)
+
+
+@dataclass
+class IndexUpdate:
+	kb: KB
+	added: List[str]
+	replaced: List[str]
+	removed: List[str]
+	skipped: List[str]  # content already indexed (same hash), nothing to do
+	failed: List[str] = field(default_factory=list)  # could not be parsed; not indexed
+
+
+def update_index(
+	add: Sequence[str] = (),
+	remove: Sequence[str] = (),
+	index_dir: Optional[str] = None,
+	backend: Optional[str] = None,
+	progress: Optional[Callable[[int, int], None]] = None,
+) -> IndexUpdate:
+	"""Add, replace or remove guideline sources in the persisted index.
+
+	Only added or replaced sources are read, chunked, tokenized and embedded;
+	the rest of the index (vectors, BM25 postings, IVF lists, quantized copy)
+	is carried over with array operations. A path whose content hash is
+	already indexed is skipped; a known path with new content replaces the
+	old version. A file that fails to parse is reported in ``failed`` and
+	left out of the manifest, so uploading it again retries it. Falls back to
+	``build_index`` when the index was built with different settings.
+	"""
+	root = Path(index_dir or INDEX_DIR)
+	with directory_lock(root):
+		return _update_index(add, remove, root, backend, progress)
+
+
+def _update_index(
+	add: Sequence[str],
+	remove: Sequence[str],
+	root: Path,
+	backend: Optional[str],
+	progress: Optional[Callable[[int, int], None]],
+) -> IndexUpdate:
+	seg_dir = root / "segments"
+	seg_dir.mkdir(parents=True, exist_ok=True)
+	embedder = get_embedder(backend)
+	manifest = _read_manifest(root)
+	current: List[dict] = list(manifest.get("sources", [])) if manifest else []
+	known_hashes = {s["sha256"] for s in current}
+	known_paths = {s["path"] for s in current}
+
+	drop = {str(p) for p in remove if str(p) in known_paths}
+	removed = sorted(drop)
+	added: List[str] = []
+	replaced: List[str] = []
+	skipped: List[str] = []
+	incoming: List[dict] = []
+	for p in add:
 		path = Path(p)
 		if not path.exists():
 			continue
-		text = path.read_text(encoding="utf-8", errors="ignore")
-		all_chunks.extend(_chunk(text))
-	embeds = _embed_texts(all_chunks) if all_chunks else []
-	return KB(chunks=all_chunks, embed=embeds, paths=[str(p) for p in paths])
+		sha = _file_hash(path)
+		if sha in known_hashes or any(s["sha256"] == sha for s in incoming):
+			skipped.append(str(p))
+			continue
+		if str(p) in known_paths:
+			drop.add(str(p))
+			replaced.append(str(p))
+		else:
+			added.append(str(p))
+		incoming.append({"path": str(p), "sha256": sha})
+
+	# Parse up front: a file that fails is not recorded (a replaced one still
+	# loses its old version, which no longer matches the file on disk)
+	failed: List[str] = []
+	ready: List[Tuple[dict, Tuple[bytes, List[Tuple[int, int]]]]] = []
+	for src, item in zip(incoming, _prepare([(src["path"], src["sha256"]) for src in incoming], root)):
+		if item[0]:
+			ready.append((src, item))
+			continue
+		failed.append(src["path"])
+		for bucket in (added, replaced):
+			if src["path"] in bucket:
+				bucket.remove(src["path"])
+	incoming = [src for src, _ in ready]
+
+	kept = [s for s in current if s["path"] not in drop]
+	if not _manifest_compatible(manifest, root, embedder.model_id):
+		kb = build_index([s["path"] for s in kept + incoming], str(root), backend, progress)
+		return IndexUpdate(kb, added, replaced, removed, skipped, failed)
+	kb = _open_index(root, manifest, embedder)
+	if not drop and not incoming:
+		return IndexUpdate(kb, added, replaced, removed, skipped, failed)
+
+	store = kb.chunks
+	keep_src = [i for i, s in enumerate(current) if s["path"] not in drop]
+	keep = np.isin(store.source, keep_src)
+	texts = [(current[i]["path"], store.source_text(i)) for i in keep_src]
+	spans = [store.source_spans(i) for i in keep_src]
+	pending: List[Tuple[str, bytes, List[Tuple[int, int]]]] = []
+	new_texts: List[str] = []
+	for src, (data, src_spans) in ready:
+		src["chunks"] = len(src_spans)
+		texts.append((src["path"], data))
+		spans.append(src_spans)
+		if src_spans:
+			pending.append((src["sha256"], data, src_spans))
+			new_texts.extend(span_text(data, s, e) for s, e in src_spans)
+	new_vectors = _source_vectors(seg_dir, pending, embedder, progress)
+
+	old_vectors = np.asarray(kb.embed)[keep]
+	added_vectors = _normalize_rows(np.concatenate(new_vectors)) if new_vectors else np.zeros((0, old_vectors.shape[1]), dtype=np.float32)
+	if old_vectors.size and added_vectors.size and old_vectors.shape[1] != added_vectors.shape[1]:
+		# Embedding dimension changed under the same model id; start over
+		kb = build_index([s["path"] for s in kept + incoming], str(root), backend, progress)
+		return IndexUpdate(kb, added, replaced, removed, skipped, failed)
+	vectors = np.concatenate([old_vectors, added_vectors]) if len(old_vectors) else added_vectors
+	bm25 = (kb.bm25.subset(keep) if kb.bm25 is not None else BM25Index.build(list(kb.chunks[i] for i in np.flatnonzero(keep)))).extend(new_texts)
+	ann_cfg = manifest.get("ann")
+	ann = None
+	if kb.ann is not None:
+		ann = kb.ann.subset(keep).add(added_vectors, len(old_vectors))
+	elif ann_cfg and vectors.size:
+		ann = IVFIndex.build(vectors, nlist=ann_cfg["nlist"])
+	quant = None
+	if kb.quant is not None:
+		quant = kb.quant.subset(keep).concat(QuantizedVectors.quantize(added_vectors, kb.quant.dtype))
+	store = ChunkStore.from_texts(texts, spans)
+	kb = _persist(root, embedder, kept + incoming, store, vectors, bm25, ann, ann_cfg, quant)
+	_LOADED.clear()
+	return IndexUpdate(kb, added, replaced, removed, skipped, failed)
+
+
+def indexed_paths(index_dir: Optional[str] = None) -> List[str]:
+	"""Source paths recorded in the persisted index manifest (empty if none)."""
+	manifest = _read_manifest(Path(index_dir or INDEX_DIR))
+	return [s["path"] for s in manifest.get("sources", [])] if manifest else []
+
+
+def source_stats(paths: Sequence[str]) -> Tuple[Tuple[int, int], ...]:
+	"""(mtime_ns, size) per path, (-1, -1) when missing; cheap change detection."""
+	stats = []
+	for p in paths:
+		try:
+			st = os.stat(p)
+			stats.append((st.st_mtime_ns, st.st_size))
+		except OSError:
+			stats.append((-1, -1))
+	return tuple(stats)
+
+
+def _open_existing(paths: List[str], root: Path, backend: Optional[str] = None) -> Optional[KB]:
+	"""The persisted index at ``root`` if it is current for ``paths``; never writes.
+
+	Holds the directory's shared lock while reading, so a concurrent build
+	cannot pair this manifest with another build's chunks or vectors.
+	"""
+	embedder = get_embedder(backend)
+	present = [Path(p) for p in paths if Path(p).exists()]
+	expected = [(str(p), _file_hash(p)) for p in present]
+	with directory_lock(root, shared=True):
+		manifest = _read_manifest(root)
+		if not _manifest_compatible(manifest, root, embedder.model_id):
+			return None
+		if [(s["path"], s["sha256"]) for s in manifest["sources"]] != expected:
+			return None
+		try:
+			return _open_index(root, manifest, embedder)
+		except Exception:
+			return None
+
+
+def load_kb(
+	paths: List[str],
+	index_dir: Optional[str] = None,
+	backend: Optional[str] = None,
+	persist: bool = True,
+) -> KB:
+	"""Return the KB for ``paths``, reusing the persisted index whenever possible.
+
+	Within a process the opened KB is cached and only re-validated when a
+	source file's size or mtime changes, so per-request cost is a few stat calls.
+	With ``persist=False`` nothing is written to disk: a current persisted
+	index is opened if there is one, otherwise the KB is built in memory.
+	"""
+	root = str(index_dir or INDEX_DIR)
+	key = (root, get_embedder(backend).model_id, tuple(str(p) for p in paths), persist)
+	stats = source_stats(paths)
+	cached = _LOADED.get(key)
+	if cached and cached[0] == stats:
+		return cached[1]
+	if persist:
+		kb = build_index(list(paths), root, backend)
+	else:
+		kb = _open_existing(list(paths), Path(root), backend) or load_guidelines(list(paths), backend)
+	_LOADED[key] = (stats, kb)
+	return kb
@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Awaitable, Dict, List, Optional, Tuple
+
+from .llmcache import LLMCache, cache_for
+from .sectionizer import split_into_sections
+
+try:
+	from openai import AsyncAzureOpenAI  # type: ignore
+except Exception:  # pragma: no cover
+	AsyncAzureOpenAI = None  # type: ignore
+
+try:
+	from openai import AsyncOpenAI  # type: ignore
+except Exception:  # pragma: no cover
+	AsyncOpenAI = None  # type: ignore
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds validate_text waits for the review before returning without it (rules.yml llm.deadline_seconds)
+DEFAULT_DEADLINE = 20.0
+
+SYSTEM_PROMPT = "You are a strict GxP auditor."
+# Part of every cache key: bump when prompts or reply parsing change
+PROMPT_VERSION = 1
+_JSON_RE = re.compile(r"\{[\s\S]*\}\s*$")
+
+# llm.mode "sections": the whole document, packed section by section into
+# prompts of at most this many (estimated) tokens, at most this many in flight
+DEFAULT_PROMPT_TOKENS = 3000
+DEFAULT_CONCURRENCY = 4
+
+# Review outcomes, reported as meta["llm_status"]
+STATUS_OK = "ok"
+STATUS_PARTIAL = "partial"  # some section prompts failed or missed the deadline
+STATUS_DISABLED = "disabled"  # llm.enabled is false
+STATUS_UNAVAILABLE = "unavailable"  # no SDK or credentials
+STATUS_ERROR = "error"  # request failed or the reply was not JSON
+STATUS_TIMEOUT = "timeout"  # deadline passed; deterministic findings only
+
+
+@dataclass
+class LLMFinding:
+	severity: str
+	message: str
+	section: Optional[str] = None  # heading of the section the finding came from (sections mode)
+
+
+@dataclass
+class LLMReview:
+	status: str
+	findings: List[LLMFinding] = field(default_factory=list)
+	cache_hits: int = 0  # prompts answered from the reply cache
+
+
+def deadline_seconds(cfg: Optional[Dict[str, object]]) -> float:
+	try:
+		return max(0.0, float((cfg or {}).get("deadline_seconds", DEFAULT_DEADLINE)))
+	except (TypeError, ValueError):
+		return DEFAULT_DEADLINE
+
+
+def _int_setting(cfg: Dict[str, object], key: str, default: int) -> int:
+	try:
+		return int(cfg.get(key, default))  # type: ignore[arg-type]
+	except (TypeError, ValueError):
+		logger.warning("Ignoring llm.%s=%r, using %d", key, cfg.get(key), default)
+		return default
+
+
+def build_prompt(text: str) -> str:
+	return (
+		"You are a GxP compliance assistant. Analyze the following document text and list any compliance gaps "
+		"such as missing approvals/signatures, missing or weak sections, placeholders, stale references, and procedure steps issues. "
+		"Return JSON with an array 'findings' where each item has fields: severity in [critical, major, minor], message.\n\n"
+		f"Document:\n{text[:12000]}"
+	)
+
+
+def build_section_prompt(part: str) -> str:
+	return (
+		"You are a GxP compliance assistant. Analyze the following sections of a longer document and list any compliance gaps "
+		"within them, such as missing approvals/signatures, weak sections, placeholders, stale references, and procedure steps issues. "
+		"Do not report sections as missing; other parts of the document are reviewed separately. "
+		"Return JSON with an array 'findings' where each item has fields: severity in [critical, major, minor], message, "
+		"section (the heading the finding belongs to).\n\n"
+		f"Sections:\n{part}"
+	)
+
+
+def parse_findings(content: str) -> Optional[List[LLMFinding]]:
+	"""Findings from a model reply ending in a JSON object; None if there is none."""
+	m = _JSON_RE.search(content or "")
+	if not m:
+		return None
+	obj = json.loads(m.group(0))
+	return [
+		LLMFinding(
+			severity=(it.get("severity") or "minor").lower(),
+			message=it.get("message") or "LLM finding",
+			section=str(it["section"]) if it.get("section") else None,
+		)
+		for it in obj.get("findings", [])
+	]
+
+
+@dataclass
+class PromptPart:
+	headings: List[str]
+	text: str
+
+
+def pack_sections(sections: List[Dict[str, str]], max_tokens: int) -> List[PromptPart]:
+	"""Group consecutive sections into parts of at most ``max_tokens`` (estimated).
+
+	A section larger than the budget gets parts of its own, cut at line
+	breaks where possible; each piece repeats the heading. Every character
+	of every section body ends up in exactly one part.
+	"""
+	max_chars = max(200, max_tokens * 4)  # ~4 characters per token
+	parts: List[PromptPart] = []
+	cur: List[str] = []
+	heads: List[str] = []
+	size = 0
+
+	def flush() -> None:
+		nonlocal size
+		if cur:
+			parts.append(PromptPart(list(heads), "\n\n".join(cur)))
+			cur.clear()
+			heads.clear()
+			size = 0
+
+	for sec in sections:
+		heading = str(sec.get("heading") or "Document")
+		body = str(sec.get("body") or "").strip()
+		block = f"## {heading}\n{body}"
+		if len(block) > max_chars:
+			flush()
+			room = max(100, max_chars - len(heading) - 4)
+			pos = 0
+			while pos < len(body):
+				end = min(len(body), pos + room)
+				if end < len(body):
+					cut = body.rfind("\n", pos + room // 2, end)
+					end = cut if cut != -1 else end
+				parts.append(PromptPart([heading], f"## {heading}\n{body[pos:end]}"))
+				pos = end
+			continue
+		if size + len(block) > max_chars:
+			flush()
+		cur.append(block)
+		heads.append(heading)
+		size += len(block) + 2
+	flush()
+	return parts
+
+
+_SEVERITY_RANK = {"critical": 3, "major": 2, "minor": 1}
+
+
+def merge_findings(groups: List[List[LLMFinding]]) -> List[LLMFinding]:
+	"""Concatenate per-part findings, dropping repeats of the same message.
+
+	Messages are compared case- and whitespace-insensitively; a repeat keeps
+	the first finding's place and section but the highest severity seen.
+	"""
+	merged: Dict[str, LLMFinding] = {}
+	for findings in groups:
+		for f in findings:
+			key = " ".join(f.message.lower().split()).rstrip(".")
+			seen = merged.get(key)
+			if seen is None:
+				merged[key] = LLMFinding(f.severity, f.message, f.section)
+			elif _SEVERITY_RANK.get(f.severity, 0) > _SEVERITY_RANK.get(seen.severity, 0):
+				seen.severity = f.severity
+	return list(merged.values())
+
+
+# Async clients keep their connection pool; they are only ever used from the review loop below
+@lru_cache(maxsize=4)
+def _azure_client(api_key: str, endpoint: str, api_version: str):
+	return AsyncAzureOpenAI(api_key=api_key, azure_endpoint=endpoint, api_version=api_version)
+
+
+@lru_cache(maxsize=4)
+def _openai_client(api_key: str):
+	return AsyncOpenAI(api_key=api_key)
+
+
+def _target(cfg: Dict[str, object]) -> Optional[Tuple[object, str]]:
+	"""(client, model or deployment) for the configured provider, or None."""
+	use_azure = (str(cfg.get("provider", "")).lower() == "azure") or (
+		os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT")
+	)
+	if use_azure and AsyncAzureOpenAI is not None:
+		api_key = os.getenv("AZURE_OPENAI_API_KEY")
+		endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+		if not (api_key and endpoint):
+			return None
+		deployment = str(cfg.get("deployment", os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")))
+		api_version = str(cfg.get("api_version", os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")))
+		return _azure_client(api_key, endpoint, api_version), deployment
+	api_key = os.getenv("OPENAI_API_KEY")
+	if AsyncOpenAI is not None and api_key:
+		return _openai_client(api_key), str(cfg.get("model", os.getenv("OPENAI_MODEL", "gpt-4o-mini")))
+	return None
+
+
+async def complete(client, model: str, prompt: str, cfg: Dict[str, object], timeout: float) -> str:
+	resp = await client.chat.completions.create(
+		model=model,
+		messages=[
+			{"role": "system", "content": SYSTEM_PROMPT},
+			{"role": "user", "content": prompt},
+		],
+		temperature=float(cfg.get("temperature", 0.1)),
+		max_tokens=int(cfg.get("max_tokens", 800)),
+		timeout=timeout,
+	)
+	return resp.choices[0].message.content or ""
+
+
+@dataclass
+class _Session:
+	"""One review: the client to ask and the reply cache in front of it."""
+	client: object
+	model: str
+	cfg: Dict[str, object]
+	cache: Optional[LLMCache] = None
+	read_cache: bool = True  # False: always ask the model, but still store the reply
+	cache_hits: int = 0
+
+	async def ask(self, prompt: str, timeout: float) -> Optional[List[LLMFinding]]:
+		key = None
+		if self.cache is not None:
+			params = {
+				"temperature": float(self.cfg.get("temperature", 0.1)),
+				"max_tokens": int(self.cfg.get("max_tokens", 800)),
+			}
+			key = LLMCache.key(prompt, SYSTEM_PROMPT, self.model, params, PROMPT_VERSION)
+			if self.read_cache:
+				reply = self.cache.get(key)
+				if reply is not None:
+					self.cache_hits += 1
+					return parse_findings(reply)
+		content = await complete(self.client, self.model, prompt, self.cfg, timeout)
+		findings = parse_findings(content)
+		if findings is not None and key is not None:
+			# Only replies that parse are worth replaying
+			self.cache.put(key, content)
+		return findings
+
+
+async def _review_single(session: _Session, text: str, deadline: float) -> LLMReview:
+	remaining = deadline - time.monotonic()
+	try:
+		findings = await asyncio.wait_for(session.ask(build_prompt(text), remaining), max(0.0, remaining))
+	except asyncio.TimeoutError:
+		return LLMReview(STATUS_TIMEOUT)
+	except Exception as e:
+		logger.warning("LLM review failed: %s", e)
+		return LLMReview(STATUS_ERROR)
+	if findings is None:
+		return LLMReview(STATUS_ERROR)
+	return LLMReview(STATUS_OK, findings, session.cache_hits)
+
+
+async def _review_sections(session: _Session, sections: List[Dict[str, str]], deadline: float) -> LLMReview:
+	cfg = session.cfg
+	parts = pack_sections(sections, _int_setting(cfg, "prompt_tokens", DEFAULT_PROMPT_TOKENS))
+	if not parts:
+		return LLMReview(STATUS_OK)
+	gate = asyncio.Semaphore(max(1, _int_setting(cfg, "concurrency", DEFAULT_CONCURRENCY)))
+
+	async def review_part(part: PromptPart) -> Optional[List[LLMFinding]]:
+		async with gate:
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				return None
+			try:
+				findings = await session.ask(build_section_prompt(part.text), remaining)
+			except Exception as e:
+				logger.warning("LLM review of %s failed: %s", ", ".join(part.headings), e)
+				return None
+			if findings is None:
+				return None
+			for f in findings:
+				# Keep the model's section only if it names one that was in the prompt
+				if f.section not in part.headings:
+					f.section = part.headings[0]
+			return findings
+
+	tasks = [asyncio.ensure_future(review_part(p)) for p in parts]
+	await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+	groups: List[List[LLMFinding]] = []
+	for task in tasks:
+		if not task.done():
+			task.cancel()
+		elif task.result() is not None:
+			groups.append(task.result())
+	if len(groups) == len(tasks):
+		status = STATUS_OK
+	elif groups:
+		status = STATUS_PARTIAL
+	else:
+		status = STATUS_TIMEOUT if time.monotonic() >= deadline else STATUS_ERROR
+	return LLMReview(status, merge_findings(groups), session.cache_hits)
+
+
+async def review_async(
+	text: str,
+	cfg: Optional[Dict[str, object]],
+	sections: "Optional[Future[List[Dict[str, str]]]]" = None,
+	deadline: Optional[float] = None,
+	use_cache: bool = True,
+) -> LLMReview:
+	"""Ask the configured model for compliance findings, giving up at ``deadline``.
+
+	``deadline`` is a time.monotonic() value (default: now + llm.deadline_seconds).
+	With ``llm.mode: sections`` the whole document is reviewed in packed
+	section prompts, run concurrently; ``sections`` is a future for
+	split_into_sections(text) computed elsewhere. Otherwise the first 12,000
+	characters go out in one prompt.
+
+	Replies are cached on disk (llmcache.py); ``use_cache=False`` or
+	LLM_CACHE_BYPASS=1 skips the lookup and refreshes the stored reply.
+	"""
+	if not cfg or not bool(cfg.get("enabled", False)):
+		return LLMReview(STATUS_DISABLED)
+	if deadline is None:
+		deadline = time.monotonic() + deadline_seconds(cfg)
+	try:
+		target = _target(cfg)
+	except Exception as e:
+		logger.warning("LLM client unavailable: %s", e)
+		target = None
+	if target is None:
+		return LLMReview(STATUS_UNAVAILABLE)
+	client, model = target
+	bypass = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+	session = _Session(client, model, cfg, cache_for(cfg), read_cache=use_cache and not bypass)
+	if str(cfg.get("mode", "single")).lower() == "sections":
+		try:
+			if sections is None:
+				parts = split_into_sections(text)
+			else:
+				parts = await asyncio.wait_for(asyncio.wrap_future(sections), max(0.0, deadline - time.monotonic()))
+		except asyncio.TimeoutError:
+			return LLMReview(STATUS_TIMEOUT)
+		except Exception as e:
+			logger.warning("Sectionizing for LLM review failed: %s", e)
+			parts = [{"heading": "Document", "body": text}]
+		return await _review_sections(session, parts, deadline)
+	return await _review_single(session, text, deadline)
+
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _loop() -> asyncio.AbstractEventLoop:
+	# One event loop per process, on a daemon thread; request threads only hand it coroutines
+	global _LOOP
+	with _LOOP_LOCK:
+		if _LOOP is None or _LOOP.is_closed():
+			loop = asyncio.new_event_loop()
+			threading.Thread(target=loop.run_forever, name="llm-review", daemon=True).start()
+			_LOOP = loop
+		return _LOOP
+
+
+def start_review(
+	text: str,
+	cfg: Optional[Dict[str, object]],
+	sections: "Optional[Future[List[Dict[str, str]]]]" = None,
+	deadline: Optional[float] = None,
+	use_cache: bool = True,
+) -> "Future[LLMReview]":
+	"""Schedule ``review_async`` and return at once; the future never raises."""
+	if not cfg or not bool(cfg.get("enabled", False)):
+		done: Future = Future()
+		done.set_result(LLMReview(STATUS_DISABLED))
+		return done
+	return asyncio.run_coroutine_threadsafe(_review_or_error(review_async(text, cfg, sections, deadline, use_cache)), _loop())
+
+
+async def _review_or_error(review: Awaitable[LLMReview]) -> LLMReview:
+	try:
+		return await review
+	except Exception as e:
+		logger.warning("LLM review failed: %s", e)
+		return LLMReview(STATUS_ERROR)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "llm_cache.sqlite"
+DEFAULT_MAX_MB = 64
+
+
+class LLMCache:
+	"""Chat completion replies on disk (SQLite), keyed by everything that shapes them.
+
+	Entries are evicted least-recently-used first once their total size
+	passes ``max_bytes``. Any database error degrades to a cache miss.
+	"""
+
+	def __init__(self, path: str | Path, max_bytes: int) -> None:
+		self.path = Path(path)
+		self.max_bytes = max(0, int(max_bytes))
+		self._lock = threading.Lock()
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("PRAGMA synchronous=NORMAL")
+		self._db.execute(
+			"CREATE TABLE IF NOT EXISTS replies ("
+			"key TEXT PRIMARY KEY, reply TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+		)
+		self._db.execute("CREATE INDEX IF NOT EXISTS replies_used ON replies(used)")
+
+	@staticmethod
+	def key(prompt: str, system: str, model: str, params: Dict[str, object], version: int) -> str:
+		blob = json.dumps([version, model, system, prompt, sorted(params.items())], ensure_ascii=False)
+		return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+	def get(self, key: str) -> Optional[str]:
+		try:
+			with self._lock:
+				row = self._db.execute("SELECT reply FROM replies WHERE key = ?", (key,)).fetchone()
+				if row is not None:
+					self._db.execute("UPDATE replies SET used = ? WHERE key = ?", (time.time(), key))
+		except sqlite3.Error as e:
+			logger.warning("LLM cache read failed: %s", e)
+			return None
+		return row[0] if row is not None else None
+
+	def put(self, key: str, reply: str) -> None:
+		size = len(reply.encode("utf-8")) + len(key)
+		if size > self.max_bytes:
+			return
+		try:
+			with self._lock:
+				self._db.execute(
+					"INSERT OR REPLACE INTO replies (key, reply, size, used) VALUES (?, ?, ?, ?)",
+					(key, reply, size, time.time()),
+				)
+				self._evict()
+		except sqlite3.Error as e:
+			logger.warning("LLM cache write failed: %s", e)
+
+	def _evict(self) -> None:
+		total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM replies").fetchone()[0]
+		excess = total - self.max_bytes
+		if excess <= 0:
+			return
+		stale = []
+		for key, size in self._db.execute("SELECT key, size FROM replies ORDER BY used"):
+			stale.append((key,))
+			excess -= size
+			if excess <= 0:
+				break
+		self._db.executemany("DELETE FROM replies WHERE key = ?", stale)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._db.execute("DELETE FROM replies")
+
+
+@lru_cache(maxsize=4)
+def _open(path: str, max_bytes: int) -> Optional[LLMCache]:
+	try:
+		return LLMCache(path, max_bytes)
+	except Exception as e:
+		logger.warning("LLM cache disabled, could not open %s: %s", path, e)
+		return None
+
+
+def cache_for(cfg: Optional[Dict[str, object]]) -> Optional[LLMCache]:
+	"""The reply cache configured under rules.yml ``llm.cache``, or None when disabled.
+
+	Defaults: enabled, ``llm_cache.sqlite`` (LLM_CACHE_PATH overrides the
+	configured path), 64 MB.
+	"""
+	opts = (cfg or {}).get("cache")
+	opts = opts if isinstance(opts, dict) else {"enabled": opts} if opts is not None else {}
+	if not bool(opts.get("enabled", True)):
+		return None
+	try:
+		max_bytes = int(float(opts.get("max_mb", DEFAULT_MAX_MB)) * 1024 * 1024)
+	except (TypeError, ValueError):
+		max_bytes = DEFAULT_MAX_MB * 1024 * 1024
+	return _open(str(os.getenv("LLM_CACHE_PATH") or opts.get("path") or DEFAULT_PATH), max_bytes)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .atomic import save_npy
+
+
+# Rows converted to float32 at a time while scanning; bounds temporary memory
+_SCAN_BLOCK = 32768
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+
+@dataclass
+class QuantizedVectors:
+	"""Compact copy of the KB matrix used for scanning.
+
+	``float16`` halves the footprint; ``int8`` stores each row as int8 codes
+	with a per-row float32 scale (``row ~= codes * scale``), a 4x reduction.
+	Scores are computed block-wise on the compact data, so the full-precision
+	matrix is only touched for the final exact re-rank.
+	"""
+	data: np.ndarray                 # (n, dim) float16 | int8
+	scale: Optional[np.ndarray] = None  # (n,) float32, int8 only
+
+	@property
+	def dtype(self) -> str:
+		return str(self.data.dtype)
+
+	@classmethod
+	def quantize(cls, vectors: np.ndarray, dtype: str) -> "QuantizedVectors":
+		if dtype == "float16":
+			return cls(data=np.asarray(vectors, dtype=np.float16))
+		if dtype == "int8":
+			vectors = np.asarray(vectors, dtype=np.float32)
+			scale = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, dtype=np.float32)
+			scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+			codes = np.clip(np.rint(vectors / scale[:, None]), -127, 127).astype(np.int8)
+			return cls(data=codes, scale=scale)
+		raise ValueError(f"Unsupported vector dtype: {dtype} (expected one of {', '.join(VECTOR_DTYPES)})")
+
+	def subset(self, keep: np.ndarray) -> "QuantizedVectors":
+		return QuantizedVectors(
+			data=np.asarray(self.data)[keep],
+			scale=None if self.scale is None else self.scale[keep],
+		)
+
+	def concat(self, other: "QuantizedVectors") -> "QuantizedVectors":
+		return QuantizedVectors(
+			data=np.concatenate([np.asarray(self.data), other.data]),
+			scale=None if self.scale is None else np.concatenate([self.scale, other.scale]),
+		)
+
+	def dot(self, qmat: np.ndarray) -> np.ndarray:
+		"""Approximate ``qmat @ vectors.T`` as a (len(qmat), n) float32 matrix."""
+		n = len(self.data)
+		out = np.empty((len(qmat), n), dtype=np.float32)
+		for lo in range(0, n, _SCAN_BLOCK):
+			block = self.data[lo: lo + _SCAN_BLOCK].astype(np.float32)
+			out[:, lo: lo + len(block)] = qmat @ block.T
+		if self.scale is not None:
+			out *= self.scale
+		return out
+
+	def take_dot(self, ids: np.ndarray, q: np.ndarray) -> np.ndarray:
+		"""Approximate scores of rows ``ids`` against a single query vector."""
+		scores = self.data[ids].astype(np.float32) @ q
+		if self.scale is not None:
+			scores *= self.scale[ids]
+		return scores
+
+	def save(self, directory: Path) -> None:
+		# Replace files instead of rewriting them: open KBs may still map vectors_q.npy
+		for name, arr in (("vectors_q", self.data), ("vectors_scale", self.scale)):
+			if arr is None:
+				continue
+			save_npy(directory / f"{name}.npy", arr)
+
+	@classmethod
+	def load(cls, directory: Path, dtype: str) -> Optional["QuantizedVectors"]:
+		try:
+			data = np.load(directory / "vectors_q.npy", mmap_mode="r")
+			scale = np.load(directory / "vectors_scale.npy") if dtype == "int8" else None
+		except Exception:
+			return None
+		if str(data.dtype) != dtype:
+			return None
+		return cls(data=data, scale=scale)
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern, Tuple
+
+import yaml
+
+from .scanner import LiteralSet, PatternSet, backtracking_risk, stdlib_compatible
+
+try:
+	import regex as _regex  # type: ignore  # per-call timeouts for rule patterns
+except Exception:  # pragma: no cover
+	_regex = None  # type: ignore
+
+
+logger = logging.getLogger(__name__)
+
+# Finding messages produced from rules.yml entries; see CompiledRules.citation_messages
+MSG_MISSING_SECTION = "Missing section: {}"
+MSG_MISSING_APPROVAL = "Missing approval line: {}"
+MSG_STEPS_NUMBERING = "Procedure lacks sufficient numbered steps"
+
+# "N/A" is common and legitimate in SOPs; this placeholder pattern is never applied
+_NA_PATTERN = r"\bN/?A\b"
+
+# Time budget per placeholder pattern per document (rules.yml pattern_timeout_ms)
+DEFAULT_PATTERN_TIMEOUT_MS = 250
+
+
+def _compile_patterns(sources: List[str]) -> Tuple[Tuple[Pattern[str], ...], List[str]]:
+	"""Compile placeholder patterns, skipping invalid ones: (patterns, rule errors).
+
+	Patterns use the ``regex`` package (VERSION0, i.e. ``re`` syntax) so a
+	time limit can be enforced per scan. Patterns with a catastrophic
+	backtracking shape are still used, under that limit, but reported.
+	Patterns using ``regex``-only syntax cannot be checked for that shape or
+	pre-filtered; they are always scanned, and reported as not checked.
+	"""
+	patterns: List[Pattern[str]] = []
+	errors: List[str] = []
+	for i, src in enumerate(sources):
+		if src.strip() == _NA_PATTERN:
+			continue
+		try:
+			if _regex is not None:
+				pat = _regex.compile(src, _regex.IGNORECASE | _regex.VERSION0)
+			else:
+				pat = re.compile(src, re.IGNORECASE)
+		except Exception as e:
+			errors.append(f"placeholder_patterns[{i}] {src!r}: invalid pattern ({e}); skipped")
+			continue
+		if _regex is not None and not stdlib_compatible(src, re.IGNORECASE):
+			errors.append(f"placeholder_patterns[{i}] {src!r}: regex-only syntax, not checked for catastrophic backtracking")
+			patterns.append(pat)
+			continue
+		risk = backtracking_risk(src, re.IGNORECASE)
+		if risk:
+			errors.append(f"placeholder_patterns[{i}] {src!r}: may backtrack catastrophically ({risk})")
+		patterns.append(pat)
+	return tuple(patterns), errors
+
+
+def _resolve_rules_path(path: Optional[str]) -> Path:
+	"""Resolve the rules.yml path robustly.
+	Priority:
+	1) Provided absolute or CWD-relative path if it exists
+	2) Project root (two levels up from this file) + config/rules.yml
+	3) CWD config/rules.yml
+	"""
+	if path:
+		candidate = Path(path)
+		if not candidate.is_absolute():
+			# First try relative to current working directory
+			if Path(path).exists():
+				candidate = Path(path)
+			else:
+				# Then relative to project root (repo root is two levels up: .../src/compliance_assistant/rules.py)
+				project_root = Path(__file__).resolve().parents[2]
+				candidate = (project_root / path).resolve()
+		if candidate.exists():
+			return candidate
+	# Fallback to project root config path
+	project_root = Path(__file__).resolve().parents[2]
+	default_path = project_root / "config" / "rules.yml"
+	if default_path.exists():
+		return default_path
+	# Last resort: try CWD config
+	cwd_fallback = Path("config") / "rules.yml"
+	if cwd_fallback.exists():
+		return cwd_fallback
+	raise FileNotFoundError(f"rules.yml not found. Tried: {path or ''}, {default_path}, {cwd_fallback}")
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+	"""rules.yml, parsed once and prepared for repeated validation.
+
+	Treat as read-only: a changed rules file produces a new object, it never
+	mutates one that a running validation may be using.
+	"""
+	raw: dict
+	required_sections: Tuple[str, ...]
+	required_sections_lower: Tuple[str, ...]
+	approvals: Tuple[str, ...]
+	approvals_lower: Tuple[str, ...]
+	placeholder_patterns: Tuple[Pattern[str], ...]  # compiled with IGNORECASE; N/A and invalid ones excluded
+	stale_years: int
+	require_numbering: bool
+	severity_weights: Dict[str, int]
+	id_penalties: Dict[str, int]
+	llm: Dict[str, object] = field(default_factory=dict)
+	kb: Dict[str, object] = field(default_factory=dict)
+	citation_messages: Tuple[str, ...] = ()
+	sha256: str = ""
+	labels: LiteralSet = field(default_factory=lambda: LiteralSet(()))  # lowercased sections + approvals
+	placeholders: PatternSet = field(default_factory=lambda: PatternSet(()))  # prefiltered placeholder_patterns
+	pattern_timeout: float = DEFAULT_PATTERN_TIMEOUT_MS / 1000  # seconds per pattern per document
+	errors: Tuple[str, ...] = ()  # problems found in rules.yml at load time, reported with each result
+	triage_min_score: int = 0  # triage fails a document whose score drops below this
+
+	@classmethod
+	def from_dict(cls, raw: Optional[dict], sha256: str = "") -> "CompiledRules":
+		raw = raw if isinstance(raw, dict) else {}
+		sections = tuple(str(s) for s in raw.get("required_sections", []) or [])
+		approvals = tuple(str(s) for s in raw.get("approvals_lines", []) or [])
+		patterns, errors = _compile_patterns([str(p) for p in raw.get("placeholder_patterns", []) or []])
+		for err in errors:
+			logger.warning("rules.yml: %s", err)
+		messages = [MSG_MISSING_SECTION.format(s) for s in sections]
+		messages += [MSG_MISSING_APPROVAL.format(s) for s in approvals]
+		messages.append(MSG_STEPS_NUMBERING)
+		return cls(
+			raw=raw,
+			required_sections=sections,
+			required_sections_lower=tuple(s.lower() for s in sections),
+			approvals=approvals,
+			approvals_lower=tuple(s.lower() for s in approvals),
+			placeholder_patterns=patterns,
+			stale_years=int((raw.get("stale_reference") or {}).get("years_threshold", 3)),
+			require_numbering=bool((raw.get("numbered_steps") or {}).get("require_numbering", True)),
+			severity_weights={str(k).lower(): int(v) for k, v in (raw.get("severity_weights") or {}).items()},
+			id_penalties={str(k): int(v) for k, v in (raw.get("id_penalties") or {}).items()},
+			llm=dict(raw.get("llm") or {}),
+			kb=dict(raw.get("kb") or {}),
+			citation_messages=tuple(messages),
+			sha256=sha256,
+			labels=LiteralSet(tuple(s.lower() for s in sections + approvals)),
+			placeholders=PatternSet(patterns),
+			pattern_timeout=float(raw.get("pattern_timeout_ms", DEFAULT_PATTERN_TIMEOUT_MS)) / 1000,
+			errors=tuple(errors),
+			triage_min_score=int((raw.get("triage") or {}).get("min_score", 0)),
+		)
+
+
+@dataclass
+class _Entry:
+	path: Path
+	stat: Tuple[int, int]  # (mtime_ns, size)
+	rules: CompiledRules
+
+
+_CACHE: Dict[str, _Entry] = {}
+_LOCK = threading.Lock()
+
+
+def _stat(path: Path) -> Tuple[int, int]:
+	st = os.stat(path)
+	return st.st_mtime_ns, st.st_size
+
+
+def get_rules(path: Optional[str] = None) -> CompiledRules:
+	"""Compiled rules for ``path`` (default config/rules.yml), cached per process.
+
+	Each call costs one stat. When mtime or size changed, the file is re-read
+	and only re-parsed if its content hash differs; the new CompiledRules
+	replaces the old one in a single assignment. If a changed file fails to
+	parse, the last good rules stay in effect.
+	"""
+	key = path or "config/rules.yml"
+	entry = _CACHE.get(key)
+	if entry is not None:
+		try:
+			if _stat(entry.path) == entry.stat:
+				return entry.rules
+		except OSError:
+			pass
+	with _LOCK:
+		entry = _CACHE.get(key)
+		stat: Optional[Tuple[int, int]] = None
+		try:
+			rules_path = entry.path if entry is not None and entry.path.exists() else _resolve_rules_path(key)
+			stat = _stat(rules_path)
+			if entry is not None and entry.path == rules_path and entry.stat == stat:
+				return entry.rules
+			data = rules_path.read_bytes()
+			sha = hashlib.sha256(data).hexdigest()
+			if entry is not None and entry.rules.sha256 == sha:
+				rules = entry.rules
+			else:
+				rules = CompiledRules.from_dict(yaml.safe_load(data), sha)
+		except Exception:
+			if entry is None:
+				raise
+			logger.exception("Could not reload rules from %s; keeping the previous version", entry.path)
+			if stat is not None:
+				# Don't retry until the file changes again
+				_CACHE[key] = _Entry(entry.path, stat, entry.rules)
+			return entry.rules
+		_CACHE[key] = _Entry(rules_path, stat, rules)
+		return rules
+
+
+def citation_templates(rules) -> List[str]:
+	"""Every finding message the deterministic rules can emit verbatim.
+
+	The KB precomputes citations for these so that validation resolves them
+	with a dictionary lookup; only free-form messages need live retrieval.
+	Accepts a CompiledRules or a raw rules dict.
+	"""
+	if not isinstance(rules, CompiledRules):
+		rules = CompiledRules.from_dict(rules)
+	return list(rules.citation_messages)
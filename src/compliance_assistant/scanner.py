@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import re
+import warnings
+from typing import Iterable, List, Optional, Pattern, Sequence, Set, Tuple
+
+try:
+	from re import _parser as _sre_parse  # type: ignore[attr-defined]  # Python 3.11+
+except ImportError:  # pragma: no cover
+	import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+_LITERAL = _sre_parse.LITERAL
+_REPEATS = (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT)
+_SUBPATTERN = _sre_parse.SUBPATTERN
+_BRANCH = _sre_parse.BRANCH
+_MAXREPEAT = _sre_parse.MAXREPEAT
+
+# Flags the stdlib parser understands; patterns compiled by the ``regex``
+# package carry extra bits (VERSION0, ...) that it would reject
+_RE_FLAGS = re.IGNORECASE | re.MULTILINE | re.DOTALL | re.VERBOSE | re.ASCII
+
+# Characters that IGNORECASE matches to ASCII letters but str.lower() does not
+# map to them (long s, Kelvin sign, dotless/dotted i); their presence disables
+# the literal pre-check for case-insensitive patterns
+_CASEFOLD_SPECIALS = ("ſ", "K", "ı", "İ")
+
+# ``regex`` fuzzy constraints (``a{e<=1}``), which the stdlib reads as literal text
+_FUZZY_RE = re.compile(r"(?<!\\)\{[\d\s,<=+]*[eisd][\d\s,<=+eisd]*\}")
+
+
+def stdlib_compatible(pattern: str, flags: int = 0) -> bool:
+	"""Whether the stdlib parser reads ``pattern`` as ``regex`` (VERSION0) does.
+
+	The literal pre-check and ``backtracking_risk`` analyse patterns with the
+	stdlib parser; ``regex``-only syntax (``\\p{..}``, POSIX classes such as
+	``[[:upper:]]``, fuzzy matching, ...) either fails to parse there or
+	parses, with a warning or silently, into something else. Such patterns
+	must not be analysed.
+	"""
+	if _FUZZY_RE.search(pattern):
+		return False
+	with warnings.catch_warnings():
+		warnings.simplefilter("error")  # e.g. FutureWarning "Possible nested set" for [[:upper:]]
+		try:
+			_sre_parse.parse(pattern, flags & _RE_FLAGS)
+		except Exception:
+			return False
+	return True
+
+
+def _literal_runs(pattern: Pattern[str]) -> List[str]:
+	"""Literal strings every match of ``pattern`` must contain (possibly none)."""
+	if not isinstance(pattern, re.Pattern) and not stdlib_compatible(pattern.pattern, pattern.flags):
+		return []  # regex-only syntax: no pre-check, always scanned
+	runs: List[str] = []
+	run: List[str] = []
+
+	def close() -> None:
+		if run:
+			runs.append("".join(run))
+			run.clear()
+
+	def walk(items) -> None:
+		for op, av in items:
+			if op is _LITERAL:
+				run.append(chr(av))
+			elif op is _SUBPATTERN:
+				walk(av[-1])
+			elif op in _REPEATS and len(av[2]) == 1 and av[2][0][0] is _LITERAL:
+				# x{n,m}: n copies are mandatory
+				run.append(chr(av[2][0][1]) * av[0])
+				if av[0] != av[1]:
+					close()
+			else:
+				close()
+
+	try:
+		walk(_sre_parse.parse(pattern.pattern, pattern.flags & _RE_FLAGS))
+	except Exception:
+		return []
+	close()
+	runs = [r for r in runs if r]
+	if pattern.flags & re.IGNORECASE:
+		runs = [r.lower() for r in runs]
+	return runs
+
+
+def _first_chars(items) -> Optional[Set[int]]:
+	"""Code points a match of ``items`` can start with, or None if unknown/any."""
+	for op, av in items:
+		if op is _LITERAL:
+			return {av}
+		if op is _SUBPATTERN:
+			return _first_chars(av[-1])
+		return None
+	return None
+
+
+def backtracking_risk(pattern: str, flags: int = 0) -> Optional[str]:
+	"""Why ``pattern`` may backtrack exponentially, or None if no risk is evident.
+
+	A static check over the parsed pattern for the two classic shapes: an
+	unbounded repeat nested inside another (``(a+)+``) and an unbounded
+	repeat over alternatives that can start with the same character
+	(``(a|ab)*``). It is a heuristic; patterns the stdlib parser cannot read
+	(see ``stdlib_compatible``) are not checked.
+	"""
+	try:
+		tree = _sre_parse.parse(pattern, flags & _RE_FLAGS)
+	except Exception:
+		return None
+
+	def walk(items, repeated: bool) -> Optional[str]:
+		for op, av in items:
+			if op in _REPEATS:
+				unbounded = av[1] is _MAXREPEAT or av[1] > 100
+				body = av[2]
+				if unbounded and repeated:
+					return "nested quantifier"
+				found = walk(body, repeated or unbounded)
+				if found:
+					return found
+			elif op is _SUBPATTERN:
+				found = walk(av[-1], repeated)
+				if found:
+					return found
+			elif op is _BRANCH:
+				branches = av[1]
+				if repeated:
+					seen: Set[int] = set()
+					for b in branches:
+						first = _first_chars(b)
+						if first is None or first & seen:
+							return "quantified alternation with overlapping branches"
+						seen |= first
+				for b in branches:
+					found = walk(b, repeated)
+					if found:
+						return found
+		return None
+
+	return walk(tree, False)
+
+
+class LiteralSet:
+	"""Which of a fixed set of labels occur in a text.
+
+	Each label is a C-level substring search (``in``); one shared, lowercased
+	copy of the document serves every label.
+	"""
+
+	def __init__(self, labels: Iterable[str]) -> None:
+		self.labels: Tuple[str, ...] = tuple(dict.fromkeys(l for l in labels if l))
+
+	def find(self, text: str) -> Set[str]:
+		return {l for l in self.labels if l in text}
+
+
+class PatternSet:
+	"""Runs a list of regexes over a text, skipping those that cannot match.
+
+	For every pattern the literal strings that any match must contain are
+	extracted once at compile time. Per document, a pattern is only scanned
+	when all of them occur in the text, which is a fast substring check; most
+	placeholder patterns are absent from most documents. Results are exactly
+	those of a separate ``finditer`` per pattern, in configuration order.
+	"""
+
+	def __init__(self, patterns: Sequence[Pattern[str]]) -> None:
+		self.patterns: Tuple[Pattern[str], ...] = tuple(patterns)
+		self._required: Tuple[List[str], ...] = tuple(_literal_runs(p) for p in self.patterns)
+
+	def scan(
+		self, text: str, lower: Optional[str] = None, timeout: Optional[float] = None
+	) -> Tuple[List[Tuple[int, "re.Match[str]"]], List[int]]:
+		"""(pattern index, match) pairs, with at most ``timeout`` seconds per pattern.
+
+		``lower`` is ``text.lower()`` if the caller has it. Returns (hits,
+		indexes of patterns that ran out of time); a pattern that times out
+		contributes no hits. Time limits need patterns compiled with the
+		``regex`` package; stdlib patterns run unbounded.
+		"""
+		hits: List[Tuple[int, re.Match[str]]] = []
+		timed_out: List[int] = []
+		folded: Optional[str] = None
+		for i, (pat, required) in enumerate(zip(self.patterns, self._required)):
+			if required:
+				if pat.flags & re.IGNORECASE:
+					if folded is None:
+						special = any(c in text for c in _CASEFOLD_SPECIALS)
+						folded = "" if special else (lower if lower is not None else text.lower())
+					hay = folded
+				else:
+					hay = text
+				if hay and not all(r in hay for r in required):
+					continue
+			if timeout is None or isinstance(pat, re.Pattern):
+				hits.extend((i, m) for m in pat.finditer(text))
+				continue
+			try:
+				found = [(i, m) for m in pat.finditer(text, timeout=timeout)]
+			except TimeoutError:
+				timed_out.append(i)
+				continue
+			hits.extend(found)
+		return hits, timed_out
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import re
-from typing import List, Dict
+from bisect import bisect_right
+from typing import Dict, List, Optional
 
 COMMON_HEADINGS = [
 	"title",
@@ -90,3 +91,45 @@ def split_into_sections(text: str) -> List[Dict[str, str]]:
 	if not sections:
 		return [{"heading": "Document", "body": text.strip(), "start": 0, "end": len(text)}]
 	return sections
+
+
+class SectionIndex:
+	"""Lookups over ``split_into_sections`` output (sections are disjoint, in order).
+
+	Character positions resolve with a bisect over the sorted start offsets.
+	Whitespace-normalized bodies are built once, on first text lookup, and
+	joined into one string so a token is located with a single ``find``.
+	"""
+
+	_SEP = "\x00"  # never part of a normalized body or token
+
+	def __init__(self, sections: List[Dict[str, str]]) -> None:
+		self.sections = sections
+		self.starts = [s.get("start", 0) for s in sections]
+		self.ends = [s.get("end", 0) for s in sections]
+		self._joined: Optional[str] = None
+		self._offsets: List[int] = []
+
+	def at(self, pos: int) -> Optional[Dict[str, str]]:
+		"""Section whose [start, end) range contains character offset ``pos``."""
+		i = bisect_right(self.starts, pos) - 1
+		if i >= 0 and pos < self.ends[i]:
+			return self.sections[i]
+		return None
+
+	def containing(self, token: str) -> Optional[Dict[str, str]]:
+		"""First section whose whitespace-normalized body contains ``token``."""
+		if not token or self._SEP in token:
+			return None
+		if self._joined is None:
+			bodies = [re.sub(r"\s+", " ", s["body"]) for s in self.sections]
+			self._offsets = []
+			pos = 0
+			for body in bodies:
+				self._offsets.append(pos)
+				pos += len(body) + 1
+			self._joined = self._SEP.join(bodies)
+		hit = self._joined.find(token)
+		if hit == -1:
+			return None
+		return self.sections[bisect_right(self._offsets, hit) - 1]
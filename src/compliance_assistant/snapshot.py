@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence, Tuple, TypeVar
+
+from .kb import KB, source_stats
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class KBSnapshot:
+	"""Immutable view of the knowledge base served to requests."""
+	paths: Tuple[str, ...]
+	kb: Optional[KB]  # None until the first build succeeds
+	stats: Tuple[Tuple[int, int], ...] = ()  # source_stats(paths) at build time
+	version: int = 0
+	fingerprint: str = ""  # fingerprint() at build time
+
+
+class KBSnapshots:
+	"""Read-copy-update holder for ``KBSnapshot``.
+
+	Readers take ``current`` (one attribute read, no lock) and keep using that
+	snapshot for the whole request. Changes run one at a time on a single
+	writer thread, which builds a complete new snapshot and publishes it by
+	rebinding ``current``; readers holding the old one are never blocked and
+	never see a half-updated KB.
+
+	``fingerprint`` names any other input of ``build`` (e.g. the rules the
+	citation table is precomputed from); a snapshot built under a different
+	fingerprint counts as stale.
+	"""
+
+	def __init__(
+		self,
+		build: Callable[[Sequence[str]], KB],
+		paths: Sequence[str] = (),
+		fingerprint: Callable[[], str] = lambda: "",
+	) -> None:
+		self._build = build
+		self._fingerprint = fingerprint
+		self._current = KBSnapshot(paths=tuple(paths), kb=None)
+		self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-writer")
+		self._refresh: Optional[Future] = None
+
+	@property
+	def current(self) -> KBSnapshot:
+		return self._current
+
+	def _publish(self, paths: Sequence[str]) -> KBSnapshot:
+		paths = tuple(paths)
+		fingerprint = self._fingerprint()  # taken first: a change during the build triggers another
+		kb = self._build(paths)
+		snapshot = KBSnapshot(
+			paths=paths,
+			kb=kb,
+			stats=source_stats(paths),
+			version=self._current.version + 1,
+			fingerprint=fingerprint,
+		)
+		self._current = snapshot  # atomic swap
+		return snapshot
+
+	def update(self, change: Callable[[Tuple[str, ...]], Tuple[Sequence[str], T]]) -> "Future[T]":
+		"""Run ``change(current paths)`` on the writer thread and publish the paths it returns.
+
+		``change`` returns ``(new paths, result)``; the future resolves to
+		``result`` once the new snapshot is live.
+		"""
+		def run() -> T:
+			paths, result = change(self._current.paths)
+			self._publish(paths)
+			return result
+		return self._writer.submit(run)
+
+	def rebuild(self, paths: Optional[Sequence[str]] = None) -> "Future[KBSnapshot]":
+		"""Build and publish a snapshot for ``paths`` (default: the current ones)."""
+		return self._writer.submit(lambda: self._publish(self._current.paths if paths is None else paths))
+
+	def refresh_if_stale(self) -> None:
+		"""Schedule a background rebuild when a source file or the fingerprint changed.
+
+		Costs a few stat calls; at most one refresh is queued at a time and the
+		caller keeps serving the current snapshot meanwhile.
+		"""
+		snapshot = self._current
+		if (
+			snapshot.kb is not None
+			and source_stats(snapshot.paths) == snapshot.stats
+			and self._fingerprint() == snapshot.fingerprint
+		):
+			return
+		pending = self._refresh
+		if pending is not None and not pending.done():
+			return
+		future = self.rebuild()
+		future.add_done_callback(_log_failure)
+		self._refresh = future
+
+
+def _log_failure(future: Future) -> None:
+	exc = future.exception()
+	if exc is not None:
+		logger.error("KB snapshot rebuild failed: %s", exc)
@@ -1,28 +1,32 @@
 from __future__ import annotations
 import datetime as _dt
+import logging
 import os
 import re
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
-from pathlib import Path
-
-import yaml
-
-try:
-	from openai import AzureOpenAI  # type: ignore
-except Exception:  # pragma: no cover
-	AzureOpenAI = None  # type: ignore
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .rules import (
+	MSG_MISSING_APPROVAL,
+	MSG_MISSING_SECTION,
+	MSG_STEPS_NUMBERING,
+	CompiledRules,
+	citation_templates,
+	get_rules,
+)
+from .analysis import DocumentAnalysis
+from .llm import STATUS_ERROR, STATUS_TIMEOUT, LLMReview, deadline_seconds, start_review
+from .sectionizer import SectionIndex
+from .scanner import PatternSet
 
 try:
-	from openai import OpenAI as StdOpenAI  # type: ignore
-except Exception:  # pragma: no cover
-	StdOpenAI = None  # type: ignore
-
-try:
-	from .kb import KB, load_guidelines  # type: ignore
+	from .kb import KB, load_kb  # type: ignore
 except Exception:
 	KB = None  # type: ignore
-	def load_guidelines(paths):
+	def load_kb(paths, backend=None, persist=True):
 		return None
 
 try:
@@ -32,6 +36,9 @@ except Exception:
 		return [{"heading": "Document", "body": text}]
 
 
+logger = logging.getLogger(__name__)
+
+
 @dataclass
 class Finding:
 	id: str
@@ -39,6 +46,7 @@ class Finding:
 	message: str
 	location: Optional[str] = None
 	citation: Optional[str] = None
+	citation_source: Optional[str] = None  # e.g. "21.txt:120-134" (file:lines) when known
 	section: Optional[str] = None
 	pos: Optional[Tuple[int, int]] = None  # (start, end) of match if available
 
@@ -50,158 +58,88 @@ class ValidationResult:
 	meta: Dict[str, str]
 
 
-def _excerpt(text: str, start: int, end: int, radius: int = 80) -> str:
-	"""Return a clean, human-readable excerpt around [start:end].
-	- Expands by radius, trims to nearest word boundary, collapses whitespace,
-	  and adds ellipses as needed.
-	"""
-	lo = max(0, start - radius)
-	hi = min(len(text), end + radius)
-	snip = text[lo:hi]
-	# Collapse newlines and multiple spaces
-	snip = re.sub(r"\s+", " ", snip).strip()
-	# Trim to word boundaries
-	m = re.search(r"\S.*\S", snip)
-	if m:
-		snip = snip[m.start(): m.end()+1]
-	prefix = "… " if lo > 0 else ""
-	suffix = " …" if hi < len(text) else ""
-	return f"{prefix}{snip}{suffix}"
-
-
-def _resolve_rules_path(path: Optional[str]) -> Path:
-	"""Resolve the rules.yml path robustly.
-	Priority:
-	1) Provided absolute or CWD-relative path if it exists
-	2) Project root (two levels up from this file) + config/rules.yml
-	3) CWD config/rules.yml
-	"""
-	if path:
-		candidate = Path(path)
-		if not candidate.is_absolute():
-			# First try relative to current working directory
-			if Path(path).exists():
-				candidate = Path(path)
-			else:
-				# Then relative to project root (repo root is two levels up: .../src/compliance_assistant/validate.py)
-				project_root = Path(__file__).resolve().parents[2]
-				candidate = (project_root / path).resolve()
-		if candidate.exists():
-			return candidate
-	# Fallback to project root config path
-	project_root = Path(__file__).resolve().parents[2]
-	default_path = project_root / "config" / "rules.yml"
-	if default_path.exists():
-		return default_path
-	# Last resort: try CWD config
-	cwd_fallback = Path("config") / "rules.yml"
-	if cwd_fallback.exists():
-		return cwd_fallback
-	raise FileNotFoundError(f"rules.yml not found. Tried: {path or ''}, {default_path}, {cwd_fallback}")
+def _load_rules(path: Optional[str] = None) -> dict:
+	return get_rules(path).raw
 
 
-def _load_rules(path: Optional[str] = None) -> dict:
-	rules_path = _resolve_rules_path(path or "config/rules.yml")
-	with open(rules_path, "r", encoding="utf-8") as f:
-		return yaml.safe_load(f)
+_SIGNATURE_LINE_RE = re.compile(r"_+")
+# Keywords (regexes over lowercased text) looked up around matches via DocumentAnalysis.word_near
+_SIGNATURE_TERMS = ("prepared by", "reviewed by", "approved by", "signature")
+_STALE_TERMS = ("effective", r"last\s*reviewed", r"last\s*updated", "version", "revision", "rev")
+_STEP_RE = re.compile(r"^(\d+\.|\d+\)|step\s*\d+\b)", re.IGNORECASE)
 
 
-def _detect_required_sections(text: str, sections: List[str]) -> List[Finding]:
+def _detect_required_sections(present: Set[str], sections: Tuple[str, ...], sections_lower: Tuple[str, ...]) -> List[Finding]:
 	findings: List[Finding] = []
-	lower_text = text.lower()
-	for sec in sections:
-		if sec.lower() not in lower_text:
+	for sec, sec_lower in zip(sections, sections_lower):
+		if sec_lower not in present:
 			# Treat missing core sections as critical
-			findings.append(Finding(id="missing_section", severity="critical", message=f"Missing section: {sec}"))
+			findings.append(Finding(id="missing_section", severity="critical", message=MSG_MISSING_SECTION.format(sec)))
 	return findings
 
 
-def _detect_approvals(text: str, approvals: List[str]) -> List[Finding]:
+def _detect_approvals(present: Set[str], approvals: Tuple[str, ...], approvals_lower: Tuple[str, ...]) -> List[Finding]:
 	findings: List[Finding] = []
-	lower_text = text.lower()
-	for label in approvals:
-		if label.lower() not in lower_text:
-			findings.append(Finding(id="missing_approval", severity="critical", message=f"Missing approval line: {label}"))
+	for label, label_lower in zip(approvals, approvals_lower):
+		if label_lower not in present:
+			findings.append(Finding(id="missing_approval", severity="critical", message=MSG_MISSING_APPROVAL.format(label)))
 	return findings
 
 
-def _detect_placeholders(text: str, patterns: List[str]) -> List[Finding]:
+def _detect_placeholders(
+	doc: DocumentAnalysis, patterns: PatternSet, timeout: Optional[float] = None, errors: Optional[List[str]] = None
+) -> List[Finding]:
 	findings: List[Finding] = []
-	for pat in patterns:
-		# Avoid penalizing common, legitimate "N/A"
-		if pat.strip() == r"\bN/?A\b":
+	# Patterns whose required literals are absent are skipped ("N/A" already dropped by CompiledRules)
+	hits, timed_out = patterns.scan(doc.text, doc.lower, timeout)
+	if errors is not None:
+		for i in timed_out:
+			errors.append(f"placeholder pattern {patterns.patterns[i].pattern!r} exceeded its {timeout * 1000:.0f} ms budget; skipped")
+	for _, m in hits:
+		# Do not treat signature lines (e.g., __________) adjacent to approval labels as placeholders
+		matched_text = m.group(0)
+		if _SIGNATURE_LINE_RE.fullmatch(matched_text) and doc.word_near(_SIGNATURE_TERMS, m.start(), m.end()):
 			continue
-		for m in re.finditer(pat, text, flags=re.IGNORECASE):
-			# Do not treat signature lines (e.g., __________) adjacent to approval labels as placeholders
-			matched_text = m.group(0)
-			if re.fullmatch(r"_+", matched_text):
-				window_lo = max(0, m.start() - 80)
-				window_hi = min(len(text), m.end() + 80)
-				window = text[window_lo:window_hi].lower()
-				if re.search(r"\b(prepared by|reviewed by|approved by|signature)\b", window):
-					continue
-			context = _excerpt(text, m.start(), m.end())
-			findings.append(Finding(id="placeholder", severity="major", message=f"Placeholder detected: '{matched_text}'", location=context, pos=(m.start(), m.end())))
+		context = doc.excerpt(m.start(), m.end())
+		findings.append(Finding(id="placeholder", severity="major", message=f"Placeholder detected: '{matched_text}'", location=context, pos=(m.start(), m.end())))
 	return findings
 
 
-def _detect_stale_references(text: str, years_threshold: int) -> List[Finding]:
+def _detect_stale_references(doc: DocumentAnalysis, years_threshold: int) -> List[Finding]:
 	findings: List[Finding] = []
 	now = _dt.datetime.now().date()
-	date_patterns = [
-		r"\b(19|20)\d{2}\b",
-		r"\b\d{1,2}[\-/](\d{1,2}|[A-Za-z]{3})[\-/](19|20)\d{2}\b",
-		r"\b(19|20)\d{2}-\d{2}-\d{2}\b",
-	]
 	seen_labels: set[str] = set()
-	for pat in date_patterns:
-		for m in re.finditer(pat, text):
-			val = m.group(0)
-			try:
-				matched = False
-				for fmt in ("%Y", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d-%b-%Y", "%d/%b/%Y"):
-					try:
-						d = _dt.datetime.strptime(val, fmt).date()
-						age_years = (now - d).days / 365.25
-						if age_years > years_threshold:
-							# Only flag if near update/version keywords to avoid penalizing citations
-							window_lo = max(0, m.start() - 80)
-							window_hi = min(len(text), m.end() + 80)
-							window = text[window_lo:window_hi].lower()
-							if re.search(r"\b(effective|last\s*(reviewed|updated)|version|rev(ision)?)\b", window):
-								# Deduplicate by label so repeated versions table rows don't stack
-								label = "version" if "version" in window else ("effective" if "effective" in window else ("last" if "last" in window else "rev"))
-								if label in seen_labels:
-									matched = True
-									break
-								seen_labels.add(label)
-								ctx = _excerpt(text, m.start(), m.end())
-								findings.append(Finding(id="stale_reference", severity="minor", message=f"Stale date/reference: {val} (~{age_years:.1f}y)", location=ctx, pos=(m.start(), m.end())))
-							matched = True
-							break
-					except Exception:
-						continue
-				if matched:
-					continue
-			except Exception:
-				continue
+	for mention in doc.dates:
+		age_years = (now - mention.date).days / 365.25
+		if age_years <= years_threshold:
+			continue
+		# Deduplicate by label so repeated versions table rows don't stack
+		label = next((k for k in ("version", "effective", "last") if doc.contains(k, mention.start, mention.end)), "rev")
+		if label in seen_labels:
+			continue
+		# Only flag if near update/version keywords to avoid penalizing citations
+		if not doc.word_near(_STALE_TERMS, mention.start, mention.end):
+			continue
+		seen_labels.add(label)
+		ctx = doc.excerpt(mention.start, mention.end)
+		findings.append(Finding(id="stale_reference", severity="minor", message=f"Stale date/reference: {mention.text} (~{age_years:.1f}y)", location=ctx, pos=(mention.start, mention.end)))
+		if len(seen_labels) == 4:
+			break  # every label reported; later dates can only repeat one
 	return findings
 
 
-def _detect_numbered_steps(text: str, require_numbering: bool) -> List[Finding]:
+def _detect_numbered_steps(doc: DocumentAnalysis, require_numbering: bool) -> List[Finding]:
 	findings: List[Finding] = []
 	if not require_numbering:
 		return findings
-	lower = text.lower()
-	idx = lower.find("procedure")
+	idx = doc.lower.find("procedure")
 	if idx == -1:
 		return findings
-	snippet = text[idx: idx + 4000]
-	lines = [l.strip() for l in snippet.splitlines() if l.strip()]
-	step_like = sum(1 for l in lines if re.match(r"^(\d+\.|\d+\)|step\s*\d+\b)", l, flags=re.IGNORECASE))
+	lines = doc.lines(idx, idx + 4000)
+	step_like = sum(1 for l in lines if _STEP_RE.match(l))
 	# Require at least 2 steps or 5% of lines, whichever is higher
 	if step_like < max(2, int(len(lines) * 0.05)):
-		findings.append(Finding(id="steps_numbering", severity="major", message="Procedure lacks sufficient numbered steps"))
+		findings.append(Finding(id="steps_numbering", severity="major", message=MSG_STEPS_NUMBERING))
 	return findings
 
 
@@ -218,109 +156,124 @@ def _score(findings: List[Finding], weights: Dict[str, int], id_penalties: Optio
 	return score
 
 
-def _maybe_llm_findings(text: str, llm_cfg: Optional[Dict[str, object]]) -> List[Finding]:
-	# Respect config flag
-	if not llm_cfg or not bool(llm_cfg.get("enabled", False)):
-		return []
-
-	# Common prompt
-	prompt = (
-		"You are a GxP compliance assistant. Analyze the following document text and list any compliance gaps "
-		"such as missing approvals/signatures, missing or weak sections, placeholders, stale references, and procedure steps issues. "
-		"Return JSON with an array 'findings' where each item has fields: severity in [critical, major, minor], message.\n\n"
-		f"Document:\n{text[:12000]}"
-	)
-
-	# Azure OpenAI path
-	use_azure = (str(llm_cfg.get("provider", "")).lower() == "azure") or (
-		os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT")
-	)
-	if use_azure and AzureOpenAI is not None:
-		api_key = os.getenv("AZURE_OPENAI_API_KEY")
-		endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-		deployment = str(llm_cfg.get("deployment", os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")))
-		api_version = str(llm_cfg.get("api_version", os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")))
-		try:
-			client = AzureOpenAI(api_key=api_key, azure_endpoint=endpoint, api_version=api_version)
-			resp = client.chat.completions.create(
-				model=deployment,
-				messages=[
-					{"role": "system", "content": "You are a strict GxP auditor."},
-					{"role": "user", "content": prompt},
-				],
-				temperature=float(llm_cfg.get("temperature", 0.1)),
-				max_tokens=int(llm_cfg.get("max_tokens", 800)),
-			)
-			content = resp.choices[0].message.content or ""
-			re_match = re.search(r"\{[\s\S]*\}\s*$", content)
-			if not re_match:
-				return []
-			import json
-			obj = json.loads(re_match.group(0))
-			llm_findings: List[Finding] = []
-			for it in obj.get("findings", []):
-				sev = (it.get("severity") or "minor").lower()
-				msg = it.get("message") or "LLM finding"
-				llm_findings.append(Finding(id="llm", severity=sev, message=msg))
-			return llm_findings
-		except Exception:
-			return []
-
-	# Standard OpenAI path
-	if StdOpenAI is not None and os.getenv("OPENAI_API_KEY"):
-		try:
-			client = StdOpenAI()
-			model = str(llm_cfg.get("model", os.getenv("OPENAI_MODEL", "gpt-4o-mini")))
-			resp = client.chat.completions.create(
-				model=model,
-				messages=[
-					{"role": "system", "content": "You are a strict GxP auditor."},
-					{"role": "user", "content": prompt},
-				],
-				temperature=float(llm_cfg.get("temperature", 0.1)),
-				max_tokens=int(llm_cfg.get("max_tokens", 800)),
-			)
-			content = resp.choices[0].message.content or ""
-			re_match = re.search(r"\{[\s\S]*\}\s*$", content)
-			if not re_match:
-				return []
-			import json
-			obj = json.loads(re_match.group(0))
-			llm_findings = []
-			for it in obj.get("findings", []):
-				sev = (it.get("severity") or "minor").lower()
-				msg = it.get("message") or "LLM finding"
-				llm_findings.append(Finding(id="llm", severity=sev, message=msg))
-			return llm_findings
-		except Exception:
-			return []
-
-	return []
-
-
-def validate_text(text: str, meta: Optional[Dict[str, str]] = None, rules_path: Optional[str] = None, kb: Optional[any] = None) -> ValidationResult:
-	rules = _load_rules(rules_path)
+def _llm_findings(review: LLMReview) -> List[Finding]:
+	return [Finding(id="llm", severity=f.severity, message=f.message, section=f.section) for f in review.findings]
+
+
+# The review stops itself at the deadline; this much longer lets it hand back partial results
+_REVIEW_GRACE = 0.25
+
+
+def _await_review(stage: "Future[LLMReview]", deadline: float) -> LLMReview:
+	"""The review if it finishes by ``deadline`` (time.monotonic), else a timed-out or failed review."""
+	try:
+		return stage.result(timeout=max(0.0, deadline + _REVIEW_GRACE - time.monotonic()))
+	except FutureTimeout:
+		stage.cancel()
+		return LLMReview(STATUS_TIMEOUT)
+	except Exception as e:
+		logger.warning("LLM review failed: %s", e)
+		return LLMReview(STATUS_ERROR)
+
+
+def _attach_citations(findings: List[Finding], kb: Optional[any]) -> None:
+	"""Set each finding's citation to its closest KB chunk.
+	Template messages come from the KB's precomputed table; the rest are
+	embedded in one request and scored in one matrix operation.
+	"""
+	if kb is None or not findings:
+		return
+	messages = list(dict.fromkeys(f.message for f in findings))
+	try:
+		table = getattr(kb, "citations", {}) or {}
+		chunk_ids = {m: table[m] for m in messages if m in table}
+		live = [m for m in messages if m not in chunk_ids]
+		if live:
+			for msg, hits in zip(live, kb.search_many(live, k=1)):
+				if hits:
+					chunk_ids[msg] = hits[0][1]
+		best: Dict[str, Tuple[str, Optional[str]]] = {}
+		for msg, chunk_id in chunk_ids.items():
+			loc = kb.location(chunk_id)
+			best[msg] = (kb.chunks[chunk_id], str(loc) if loc else None)
+	except Exception:
+		return
+	for f in findings:
+		if f.message in best:
+			f.citation, f.citation_source = best[f.message]
+
+
+# Shared by all validations; stages never wait on each other, so a full pool only queues work
+_STAGES = ThreadPoolExecutor(max_workers=int(os.getenv("VALIDATE_STAGE_WORKERS", "8")), thread_name_prefix="validate")
+
+
+# Deterministic detectors in report order, as (name, run(doc, rules, present, errors)).
+# ``present`` is rules.labels.find(doc.lower); ``errors`` collects rule errors.
+DETECTORS: Tuple[Tuple[str, Callable[[DocumentAnalysis, CompiledRules, Set[str], Optional[List[str]]], List[Finding]]], ...] = (
+	("required_sections", lambda doc, rules, present, errors: _detect_required_sections(present, rules.required_sections, rules.required_sections_lower)),
+	("approvals", lambda doc, rules, present, errors: _detect_approvals(present, rules.approvals, rules.approvals_lower)),
+	("placeholders", lambda doc, rules, present, errors: _detect_placeholders(doc, rules.placeholders, rules.pattern_timeout, errors)),
+	("stale_references", lambda doc, rules, present, errors: _detect_stale_references(doc, rules.stale_years)),
+	("numbered_steps", lambda doc, rules, present, errors: _detect_numbered_steps(doc, rules.require_numbering)),
+)
+
+
+def _deterministic_findings(text: str, rules: CompiledRules, errors: Optional[List[str]] = None) -> List[Finding]:
 	findings: List[Finding] = []
-	findings += _detect_required_sections(text, rules.get("required_sections", []))
-	findings += _detect_approvals(text, rules.get("approvals_lines", []))
-	findings += _detect_placeholders(text, rules.get("placeholder_patterns", []))
-	findings += _detect_stale_references(text, int(rules.get("stale_reference", {}).get("years_threshold", 3)))
-	findings += _detect_numbered_steps(text, bool(rules.get("numbered_steps", {}).get("require_numbering", True)))
-	# Optional AI (LLM)
-	findings += _maybe_llm_findings(text, rules.get("llm"))
-	# Attach citations from KB if available
-	if kb is None:
-		kb = load_guidelines(["21.txt", "general.txt"])  # project root defaults
+	doc = DocumentAnalysis(text)
+	present = rules.labels.find(doc.lower)
+	for _, detect in DETECTORS:
+		findings += detect(doc, rules, present, errors)
+	return findings
+
+
+def _default_kb(rules: CompiledRules) -> Optional[any]:
 	try:
+		# Project root defaults; reuses a current persisted index but never writes one
+		kb = load_kb(["21.txt", "general.txt"], backend=rules.kb.get("embed_backend"), persist=False)
 		if kb is not None:
-			for f in findings:
-				sims = kb.similar(f.message, k=1)
-				if sims:
-					f.citation = sims[0][1]
+			kb.precompute_citations(citation_templates(rules), persist=False)
+		return kb
 	except Exception:
-		pass
+		return None
+
+
+def validate_text(
+	text: str,
+	meta: Optional[Dict[str, str]] = None,
+	rules_path: Optional[str] = None,
+	kb: Optional[any] = None,
+	llm_cache: bool = True,
+) -> ValidationResult:
+	rules = get_rules(rules_path)
+	# Independent stages overlap with detection and citation lookup: the LLM
+	# review (on its own event loop, bounded by llm.deadline_seconds), and on
+	# the pool sectionizing and (if needed) opening the KB. Results are merged
+	# below in a fixed order, as if run serially. Past the deadline the result
+	# has deterministic findings plus whatever section prompts completed, and
+	# meta["llm_status"] says so ("partial" or "timeout").
+	deadline = time.monotonic() + deadline_seconds(rules.llm)
+	sections_stage = _STAGES.submit(split_into_sections, text)
+	llm_stage = start_review(text, rules.llm, sections=sections_stage, deadline=deadline, use_cache=llm_cache)
+	kb_stage = _STAGES.submit(_default_kb, rules) if kb is None else None
+	rule_errors = list(rules.errors)
+	findings = _deterministic_findings(text, rules, rule_errors)
+	if kb_stage is not None:
+		kb = kb_stage.result()
+	if llm_stage.done():
+		review = _await_review(llm_stage, deadline)
+		findings += _llm_findings(review)
+		_attach_citations(findings, kb)
+	else:
+		# Cite deterministic findings while the LLM call is still running
+		_attach_citations(findings, kb)
+		review = _await_review(llm_stage, deadline)
+		llm_findings = _llm_findings(review)
+		_attach_citations(llm_findings, kb)
+		findings += llm_findings
+	sections = sections_stage.result()
 	# Map findings to sections for better context
-	sections = split_into_sections(text)
+	index = SectionIndex(sections)
 	for f in findings:
 		if f.id == "missing_section":
 			# encode the missing section name as the section
@@ -332,24 +285,70 @@ def validate_text(text: str, meta: Optional[Dict[str, str]] = None, rules_path:
 			continue
 		# Use precise position if available
 		if f.pos:
-			start, end = f.pos
-			for s in sections:
-				if start >= s.get("start", 0) and start < s.get("end", 0):
-					f.section = s["heading"]
-					break
+			hit = index.at(f.pos[0])
+			if hit is not None:
+				f.section = hit["heading"]
 		# Fallback using token search
-		if not f.section:
-			token = None
-			if f.location:
-				token = re.sub(r"\s+", " ", f.location.strip())[:40]
-			if token:
-				for s in sections:
-					if token in re.sub(r"\s+", " ", s["body"]):
-						f.section = s["heading"]
-						break
+		if not f.section and f.location:
+			hit = index.containing(re.sub(r"\s+", " ", f.location.strip())[:40])
+			if hit is not None:
+				f.section = hit["heading"]
 		if not f.section and sections:
 			f.section = sections[0]["heading"]
-	weights = {str(k).lower(): int(v) for k, v in rules.get("severity_weights", {}).items()}
-	id_penalties_cfg = rules.get("id_penalties", {}) if isinstance(rules, dict) else {}
-	score = _score(findings, weights, id_penalties_cfg)
-	return ValidationResult(findings=findings, score=score, meta=meta or {})
+	score = _score(findings, rules.severity_weights, rules.id_penalties)
+	meta = dict(meta or {})
+	meta["llm_status"] = review.status
+	if review.cache_hits:
+		meta["llm_cache_hits"] = str(review.cache_hits)
+	if rule_errors:
+		meta["rule_errors"] = "; ".join(rule_errors)
+	return ValidationResult(findings=findings, score=score, meta=meta)
+
+
+@dataclass
+class TriageResult:
+	passed: bool
+	reason: str  # what decided the outcome
+	findings: List[Finding]  # those found before the decision
+	score: int  # of ``findings``; an upper bound on the full score when stopped early
+	checked: List[str]  # detectors that ran, in order
+	errors: List[str] = field(default_factory=list)  # rule errors, e.g. patterns skipped on timeout
+
+
+# Cheapest first (see `cli rules bench`); the label checks are also the only
+# detectors that report critical findings, so most failing documents stop there
+_TRIAGE_ORDER = ("required_sections", "approvals", "numbered_steps", "placeholders", "stale_references")
+
+
+def triage_text(text: str, rules_path: Optional[str] = None, min_score: Optional[int] = None) -> TriageResult:
+	"""Pass/fail screening: deterministic detectors only, stopping once the outcome is known.
+
+	A document fails on its first critical finding or as soon as its score
+	drops below ``min_score`` (default: rules.yml triage.min_score); scores
+	only go down as findings are added, so neither can be undone by the
+	detectors not yet run. No LLM review, KB citations or section mapping.
+	Rule errors (bad patterns, patterns that ran out of time) are collected
+	in ``errors``; a document that passes despite them says so in ``reason``.
+	"""
+	rules = get_rules(rules_path)
+	threshold = rules.triage_min_score if min_score is None else min_score
+	detectors = dict(DETECTORS)
+	doc = DocumentAnalysis(text)
+	present = rules.labels.find(doc.lower)
+	findings: List[Finding] = []
+	checked: List[str] = []
+	errors = list(rules.errors)
+	for name in _TRIAGE_ORDER:
+		found = detectors[name](doc, rules, present, errors)
+		checked.append(name)
+		findings += found
+		critical = next((f for f in found if f.severity == "critical"), None)
+		if critical is not None:
+			return TriageResult(False, f"critical: {critical.message}", findings, _score(findings, rules.severity_weights, rules.id_penalties), checked, errors)
+		score = _score(findings, rules.severity_weights, rules.id_penalties)
+		if score < threshold:
+			return TriageResult(False, f"score {score} below {threshold}", findings, score, checked, errors)
+	reason = "no critical findings"
+	if errors:
+		reason += f", but {len(errors)} rule error(s); some checks may be incomplete"
+	return TriageResult(True, reason, findings, _score(findings, rules.severity_weights, rules.id_penalties), checked, errors)
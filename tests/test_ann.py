@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from compliance_assistant.ann import IVFIndex
+from compliance_assistant.kb import KB, build_index
+from compliance_assistant.quantize import QuantizedVectors
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _unit(mat):
+	return (mat / np.linalg.norm(mat, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def clustered():
+	"""4000 normalized vectors around 40 centers, plus 50 queries drawn the same way."""
+	rng = np.random.default_rng(7)
+	centers = rng.normal(size=(40, 32))
+	vectors = _unit(centers[rng.integers(0, 40, 4000)] + 0.3 * rng.normal(size=(4000, 32)))
+	queries = _unit(centers[rng.integers(0, 40, 50)] + 0.3 * rng.normal(size=(50, 32)))
+	return vectors, queries
+
+
+def _exact(vectors, queries, k):
+	return [set(np.argsort(-(vectors @ q))[:k]) for q in queries]
+
+
+def _kb(vectors, **kwargs):
+	return KB(chunks=[f"chunk {i}" for i in range(len(vectors))], embed=vectors, paths=[], **kwargs)
+
+
+def test_every_row_is_in_exactly_one_list(clustered):
+	vectors, _ = clustered
+	ann = IVFIndex.build(vectors, nlist=64)
+	assert sorted(ann.ids.tolist()) == list(range(len(vectors)))
+	assert ann.offsets[-1] == len(vectors)
+
+
+def test_probing_every_list_is_exact(clustered):
+	vectors, queries = clustered
+	ann = IVFIndex.build(vectors, nlist=64, nprobe=64)
+	kb = _kb(vectors, ann=ann)
+	got = [{i for _, i in hits} for hits in kb._search(queries, 10)]
+	assert got == _exact(vectors, queries, 10)
+
+
+def test_recall_at_default_nprobe(clustered):
+	vectors, queries = clustered
+	kb = _kb(vectors, ann=IVFIndex.build(vectors, nlist=64, nprobe=8))
+	got = [{i for _, i in hits} for hits in kb._search(queries, 10)]
+	recall = np.mean([len(g & e) / 10 for g, e in zip(got, _exact(vectors, queries, 10))])
+	assert recall >= 0.9
+
+
+def test_subset_and_add_keep_every_row(clustered):
+	vectors, _ = clustered
+	ann = IVFIndex.build(vectors[:3000], nlist=32)
+	keep = np.ones(3000, dtype=bool)
+	keep[::3] = False
+	updated = ann.subset(keep).add(vectors[3000:], int(keep.sum()))
+	assert sorted(updated.ids.tolist()) == list(range(int(keep.sum()) + 1000))
+
+
+def test_missing_ivf_files_fall_back_to_exhaustive_search(tmp_path, monkeypatch):
+	monkeypatch.setenv("KB_ANN", "on")
+	root = tmp_path / "idx"
+	paths = [str(ROOT / "21.txt"), str(ROOT / "general.txt")]
+	kb = build_index(paths, str(root), "hashing")
+	assert kb.ann is not None
+	for f in root.glob("ivf_*.npy"):
+		f.unlink()
+	reopened = build_index(paths, str(root), "hashing")
+	assert reopened.ann is None
+	monkeypatch.setenv("KB_RETRIEVAL", "dense")
+	assert len(reopened.search_many(["electronic signatures"], k=3)[0]) == 3
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_scores_are_close(clustered, dtype):
+	vectors, queries = clustered
+	approx = QuantizedVectors.quantize(vectors, dtype).dot(queries)
+	assert np.abs(approx - queries @ vectors.T).max() < 0.02
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_rerank_returns_exact_scores(clustered, monkeypatch, dtype):
+	monkeypatch.setenv("KB_RERANK_FACTOR", "4")
+	vectors, queries = clustered
+	kb = _kb(vectors, quant=QuantizedVectors.quantize(vectors, dtype))
+	for q, hits in zip(queries, kb._search(queries, 5)):
+		exact = vectors @ q
+		assert [i for _, i in hits] == list(np.argsort(-exact, kind="stable")[:5])
+		assert [sc for sc, _ in hits] == pytest.approx([float(exact[i]) for _, i in hits])
+
+
+def test_quantized_subset_and_concat(clustered):
+	vectors, queries = clustered
+	q = QuantizedVectors.quantize(vectors, "int8")
+	keep = np.arange(len(vectors)) % 2 == 0
+	joined = q.subset(keep).concat(QuantizedVectors.quantize(vectors[:10], "int8"))
+	expected = QuantizedVectors.quantize(np.concatenate([vectors[keep], vectors[:10]]), "int8")
+	np.testing.assert_array_equal(joined.data, expected.data)
+	np.testing.assert_allclose(joined.dot(queries[:3]), expected.dot(queries[:3]))
@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+import pytest
+import yaml
+from click.testing import CliRunner
+
+from compliance_assistant.cli import cli
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def lenient_rules(tmp_path):
+	"""config/rules.yml without required sections or approvals, plus a slow placeholder pattern."""
+	raw = yaml.safe_load((ROOT / "config" / "rules.yml").read_text())
+	raw["required_sections"] = []
+	raw["approvals_required"] = []
+	raw["placeholder_patterns"] = list(raw["placeholder_patterns"]) + ["a.*a.*a.*a.*a.*z"]
+	raw["pattern_timeout_ms"] = 5
+	path = tmp_path / "rules.yml"
+	path.write_text(yaml.safe_dump(raw))
+	return str(path)
+
+
+def _invoke(*args):
+	return CliRunner().invoke(cli, [str(a) for a in args])
+
+
+def test_triage_fails_a_document_missing_sections(tmp_path):
+	doc = tmp_path / "draft.txt"
+	doc.write_text("Some notes without any structure.\n")
+	result = _invoke("triage", doc)
+	assert result.exit_code == 1
+	assert result.output.startswith("FAIL  draft.txt  (critical: Missing section:")
+	assert "0 passed, 1 failed" in result.output
+
+
+def test_triage_passes_and_reports_rule_errors(tmp_path, lenient_rules):
+	doc = tmp_path / "sop.txt"
+	doc.write_text("Procedure text\n" + "a" * 3000 + "\nz\n")
+	result = _invoke("triage", doc, "--rules", lenient_rules, "--min-score", -1000)
+	assert result.exit_code == 0
+	assert "PASS  sop.txt  (no critical findings, but 1 rule error(s)" in result.output
+	assert "rule error: placeholder pattern 'a.*a.*a.*a.*a.*z' exceeded its 5 ms budget" in result.output
+
+	result = _invoke("triage", doc, "--rules", lenient_rules, "--min-score", -1000, "--json")
+	row = json.loads(result.output)
+	assert row["passed"] is True
+	assert len(row["errors"]) == 1 and "exceeded" in row["errors"][0]
+
+
+def test_triage_exit_status_counts_every_document(tmp_path, lenient_rules):
+	(tmp_path / "docs").mkdir()
+	steps = "Procedure\n1. Do it.\n2. Check it.\n3. File it.\n4. Sign it.\n"
+	(tmp_path / "docs" / "a.txt").write_text(steps)
+	(tmp_path / "docs" / "b.txt").write_text("Owner: XXXX\n" * 3 + steps)
+	result = _invoke("triage", tmp_path / "docs", "--rules", lenient_rules, "--min-score", 95)
+	assert result.exit_code == 1
+	assert result.output.splitlines()[-1] == "1 passed, 1 failed"
+
+
+def test_triage_without_documents_is_an_error(tmp_path):
+	(tmp_path / "empty").mkdir()
+	result = _invoke("triage", tmp_path / "empty")
+	assert result.exit_code != 0
+	assert "No readable documents" in result.output
+
+
+def test_rules_bench_reports_every_rule(tmp_path):
+	doc = tmp_path / "sop.txt"
+	doc.write_text((ROOT / "21.txt").read_text())
+	result = _invoke("rules", "bench", doc, "--repeat", 1, "--json")
+	assert result.exit_code == 0
+	report = json.loads(result.output)
+	assert report["documents"] == 1
+	names = {r["rule"] for r in report["rules"]}
+	assert {"analysis", "labels", "dates", "detector:placeholders"} <= names
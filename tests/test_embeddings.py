@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from compliance_assistant import embeddings
+from compliance_assistant.embeddings import HashingEmbedder, _resolve_backend, embed_batched
+
+
+@pytest.mark.parametrize("configured", [None, "", "auto", "AUTO"])
+def test_env_backend_overrides_auto_config(monkeypatch, configured):
+	monkeypatch.setenv("KB_EMBED_BACKEND", "azure")
+	assert _resolve_backend(configured) == "azure"
+
+
+def test_explicit_backend_wins_over_env(monkeypatch):
+	monkeypatch.setenv("KB_EMBED_BACKEND", "azure")
+	assert _resolve_backend("hashing") == "hashing"
+
+
+def test_auto_without_credentials_is_hashing(monkeypatch):
+	monkeypatch.delenv("KB_EMBED_BACKEND", raising=False)
+	monkeypatch.setattr(embeddings, "_azure_client", lambda: None)
+	assert _resolve_backend("auto") == "hashing"
+
+
+def test_local_batches_match_single_call(monkeypatch):
+	monkeypatch.setenv("KB_EMBED_LOCAL_BATCH_CHARS", "200")
+	texts = [f"electronic record {i} signature approval" * (1 + i % 3) for i in range(40)]
+	embedder = HashingEmbedder(dim=64)
+	calls = []
+	result = embed_batched(embedder, texts, progress=lambda done, total: calls.append(done))
+	assert len(calls) > 1 and calls[-1] == len(texts)
+	assert not result.failed.any()
+	np.testing.assert_allclose(result.vectors, embedder.embed(texts), rtol=1e-6)
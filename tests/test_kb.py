@@ -0,0 +1,120 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from compliance_assistant.atomic import directory_lock
+from compliance_assistant.kb import _open_existing, build_index, indexed_paths, load_guidelines, load_kb, update_index
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.mark.parametrize("paths", [[], ["missing.txt"]])
+def test_load_guidelines_without_chunks_is_empty(paths):
+	kb = load_guidelines(paths, backend="hashing")
+	assert len(kb.chunks) == 0
+	assert kb.embed.shape == (0, 512)
+	assert kb.embed.dtype == np.float32
+	assert kb.search_many(["approval"]) == [[]]
+
+
+def test_build_index_without_chunks_is_empty(tmp_path):
+	kb = build_index([], str(tmp_path / "idx"), "hashing")
+	assert len(kb.chunks) == 0
+	assert kb.embed.shape == (0, 512)
+	assert kb.search_many(["approval"]) == [[]]
+
+
+def test_read_only_load_waits_for_a_running_build(tmp_path):
+	source = tmp_path / "g.txt"
+	source.write_text("Electronic records shall be protected.\n\nSignatures are linked to records.\n")
+	root = tmp_path / "idx"
+	build_index([str(source)], str(root), "hashing")
+	opened = []
+	with directory_lock(root):
+		reader = threading.Thread(target=lambda: opened.append(_open_existing([str(source)], root, "hashing")))
+		reader.start()
+		reader.join(0.3)
+		assert reader.is_alive()  # blocked behind the writer
+	reader.join(5)
+	assert opened and opened[0] is not None and len(opened[0].chunks) > 0
+
+
+def test_read_only_load_creates_nothing(tmp_path):
+	root = tmp_path / "idx"
+	kb = load_kb([str(ROOT / "general.txt")], str(root), "hashing", persist=False)
+	assert len(kb.chunks) > 0
+	assert not root.exists()
+
+
+def _write(path, text):
+	path.write_text(text)
+	return str(path)
+
+
+@pytest.fixture
+def guideline_dir(tmp_path):
+	a = _write(tmp_path / "a.txt", "Electronic records shall be protected.\n\nAudit trails are reviewed monthly.\n")
+	b = _write(tmp_path / "b.txt", "Signatures are linked to their records.\n\nTraining is documented.\n")
+	return tmp_path, a, b
+
+
+def _chunks(kb):
+	return list(kb.chunks)
+
+
+def test_update_index_adds_and_matches_a_fresh_build(guideline_dir):
+	tmp, a, b = guideline_dir
+	root = str(tmp / "idx")
+	build_index([a], root, "hashing")
+	update = update_index(add=[b], index_dir=root, backend="hashing")
+	assert update.added == [b] and update.skipped == [] and update.failed == []
+	fresh = build_index([a, b], str(tmp / "fresh"), "hashing")
+	assert _chunks(update.kb) == _chunks(fresh)
+	np.testing.assert_allclose(np.asarray(update.kb.embed), np.asarray(fresh.embed))
+	assert indexed_paths(root) == [a, b]
+
+
+def test_update_index_skips_known_content(guideline_dir):
+	tmp, a, _ = guideline_dir
+	root = str(tmp / "idx")
+	build_index([a], root, "hashing")
+	copy = _write(tmp / "copy.txt", (tmp / "a.txt").read_text())
+	update = update_index(add=[a, copy], index_dir=root, backend="hashing")
+	assert update.skipped == [a, copy] and update.added == []
+	assert indexed_paths(root) == [a]
+
+
+def test_update_index_replaces_changed_file(guideline_dir):
+	tmp, a, b = guideline_dir
+	root = str(tmp / "idx")
+	build_index([a, b], root, "hashing")
+	_write(tmp / "a.txt", "Passwords are changed every ninety days.\n")
+	update = update_index(add=[a], index_dir=root, backend="hashing")
+	assert update.replaced == [a]
+	texts = _chunks(update.kb)
+	assert any("ninety days" in t for t in texts)
+	assert not any("Audit trails" in t for t in texts)
+
+
+def test_update_index_removes_file(guideline_dir):
+	tmp, a, b = guideline_dir
+	root = str(tmp / "idx")
+	build_index([a, b], root, "hashing")
+	update = update_index(remove=[a], index_dir=root, backend="hashing")
+	assert update.removed == [a]
+	assert indexed_paths(root) == [b]
+	assert _chunks(update.kb) == _chunks(build_index([b], str(tmp / "fresh"), "hashing"))
+
+
+def test_unparsable_file_is_not_recorded(guideline_dir):
+	tmp, a, _ = guideline_dir
+	root = str(tmp / "idx")
+	bad = tmp / "bad.pdf"
+	bad.write_bytes(b"not a pdf")
+	build_index([a, str(bad)], root, "hashing")
+	assert indexed_paths(root) == [a]
+	update = update_index(add=[str(bad)], index_dir=root, backend="hashing")
+	assert update.failed == [str(bad)] and update.skipped == []
+	assert indexed_paths(root) == [a]
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from compliance_assistant import llm
+from compliance_assistant.llm import STATUS_ERROR, STATUS_OK, STATUS_PARTIAL, STATUS_TIMEOUT, start_review
+from compliance_assistant.validate import _await_review
+
+DOC = "PURPOSE\nDescribe the process.\n\nPROCEDURE\n1. Sign the record.\n2. File it.\n"
+
+
+class FakeModel:
+	def __init__(self):
+		self.prompts = []
+		self.delay = 0.0
+
+	async def complete(self, client, model, prompt, cfg, timeout):
+		self.prompts.append(prompt)
+		await asyncio.sleep(self.delay)
+		return json.dumps({"findings": [{"severity": "minor", "message": "fake finding"}]})
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+	"""Route reviews to an in-process fake model."""
+	model = FakeModel()
+	monkeypatch.setattr(llm, "_target", lambda cfg: (object(), "fake-model"))
+	monkeypatch.setattr(llm, "complete", model.complete)
+	return model
+
+
+def _cfg(**overrides):
+	cfg = {"enabled": True, "mode": "sections", "deadline_seconds": 5, "cache": {"enabled": False}}
+	cfg.update(overrides)
+	return cfg
+
+
+def test_sections_review_ok(fake_model):
+	review = start_review(DOC, _cfg()).result(timeout=10)
+	assert review.status == STATUS_OK
+	assert [f.message for f in review.findings] == ["fake finding"] * len(fake_model.prompts)
+
+
+def test_non_numeric_settings_fall_back_to_defaults(fake_model):
+	review = start_review(DOC, _cfg(prompt_tokens="lots", concurrency="many")).result(timeout=10)
+	assert review.status == STATUS_OK
+
+
+def test_review_future_never_raises(fake_model, monkeypatch):
+	async def broken(*args, **kwargs):
+		raise RuntimeError("boom")
+
+	monkeypatch.setattr(llm, "_review_sections", broken)
+	assert start_review(DOC, _cfg()).result(timeout=10).status == STATUS_ERROR
+
+
+def test_await_review_maps_exceptions_to_error():
+	failed: Future = Future()
+	failed.set_exception(RuntimeError("boom"))
+	assert _await_review(failed, time.monotonic() + 1).status == STATUS_ERROR
+
+
+def test_deadline_returns_without_the_review(fake_model):
+	fake_model.delay = 2.0
+	start = time.monotonic()
+	review = start_review(DOC, _cfg(mode="single"), deadline=time.monotonic() + 0.2).result(timeout=10)
+	assert review.status in (STATUS_TIMEOUT, STATUS_PARTIAL)
+	assert time.monotonic() - start < 1.5
+
+
+def test_repeated_review_is_answered_from_the_cache(fake_model, tmp_path, monkeypatch):
+	monkeypatch.delenv("LLM_CACHE_PATH", raising=False)
+	monkeypatch.delenv("LLM_CACHE_BYPASS", raising=False)
+	cfg = _cfg(mode="single", cache={"enabled": True, "path": str(tmp_path / "cache.sqlite")})
+	first = start_review(DOC, cfg).result(timeout=10)
+	second = start_review(DOC, cfg).result(timeout=10)
+	assert first.status == second.status == STATUS_OK
+	assert len(fake_model.prompts) == 1
+	assert (first.cache_hits, second.cache_hits) == (0, 1)
+	assert [f.message for f in second.findings] == [f.message for f in first.findings]
+	bypassed = start_review(DOC, cfg, use_cache=False).result(timeout=10)
+	assert bypassed.cache_hits == 0 and len(fake_model.prompts) == 2
@@ -0,0 +1,55 @@
+import sqlite3
+
+from compliance_assistant.llmcache import LLMCache, cache_for
+
+
+def _key(prompt, temperature=0.1, model="m"):
+	return LLMCache.key(prompt, "system", model, {"temperature": temperature}, 1)
+
+
+def test_round_trip_and_persistence(tmp_path):
+	path = tmp_path / "cache.sqlite"
+	cache = LLMCache(path, 1 << 20)
+	cache.put(_key("p"), '{"findings": []}')
+	assert cache.get(_key("p")) == '{"findings": []}'
+	assert LLMCache(path, 1 << 20).get(_key("p")) == '{"findings": []}'
+	assert cache.get(_key("other")) is None
+
+
+def test_key_covers_everything_that_shapes_the_reply():
+	keys = {_key("p"), _key("p", temperature=0.2), _key("p", model="m2"), _key("q")}
+	assert len(keys) == 4
+	assert _key("p") == _key("p")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+	reply = "x" * 400
+	cache = LLMCache(tmp_path / "cache.sqlite", 3 * (400 + 64))
+	for name in ("a", "b", "c"):
+		cache.put(_key(name), reply)
+	assert cache.get(_key("a")) == reply  # "a" is now more recent than "b"
+	cache.put(_key("d"), reply)
+	assert cache.get(_key("b")) is None
+	assert all(cache.get(_key(name)) == reply for name in ("a", "c", "d"))
+
+
+def test_oversized_reply_is_not_stored(tmp_path):
+	cache = LLMCache(tmp_path / "cache.sqlite", 100)
+	cache.put(_key("p"), "x" * 200)
+	assert cache.get(_key("p")) is None
+
+
+def test_database_errors_degrade_to_misses(tmp_path):
+	cache = LLMCache(tmp_path / "cache.sqlite", 1 << 20)
+	cache._db.execute("DROP TABLE replies")
+	assert cache.get(_key("p")) is None
+	cache.put(_key("p"), "reply")  # logged, not raised
+
+
+def test_cache_for_settings(tmp_path, monkeypatch):
+	monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "env.sqlite"))
+	assert cache_for({"cache": {"enabled": False}}) is None
+	assert cache_for({"cache": False}) is None
+	cache = cache_for({"cache": {"max_mb": "not a number"}})
+	assert cache is not None and cache.path == tmp_path / "env.sqlite"
+	assert isinstance(cache._db, sqlite3.Connection)
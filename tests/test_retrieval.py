@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from compliance_assistant.bm25 import BM25Index
+from compliance_assistant.kb import load_guidelines
+
+ROOT = Path(__file__).resolve().parents[1]
+GUIDELINES = [str(ROOT / "21.txt"), str(ROOT / "general.txt")]
+QUERIES = ["electronic signatures must be linked to their records", "software verification", "zzzz qqqq"]
+
+
+class ZeroEmbedder:
+	"""Stands in for a remote backend whose requests all failed."""
+	remote = True
+	model_id = "zero"
+
+	def embed(self, texts):
+		return np.zeros((len(texts), 512), dtype=np.float32)
+
+
+@pytest.fixture(scope="module")
+def kb():
+	return load_guidelines(GUIDELINES, backend="hashing")
+
+
+def test_bm25_ranks_matching_chunks_first(kb):
+	hits = kb.bm25.search("software verification", 5)
+	assert hits and all("verification" in kb.chunks[i].lower() or "software" in kb.chunks[i].lower() for i, _ in hits[:3])
+	scores = [sc for _, sc in hits]
+	assert scores == sorted(scores, reverse=True)
+
+
+def test_bm25_subset_and_extend_match_a_fresh_build():
+	texts = ["audit trail review", "electronic signature manifest", "training records", "audit of signatures"]
+	keep = np.array([True, False, True, True])
+	rebuilt = BM25Index.build([t for t, k in zip(texts, keep) if k] + ["signature audit trail"])
+	carried = BM25Index.build(texts).subset(keep).extend(["signature audit trail"])
+	for q in ("audit", "signature trail", "training"):
+		assert carried.search(q, 4) == pytest.approx(rebuilt.search(q, 4))
+
+
+@pytest.mark.parametrize("mode", ["hybrid", "dense", "lexical"])
+def test_search_modes_return_k_hits(kb, monkeypatch, mode):
+	monkeypatch.setenv("KB_RETRIEVAL", mode)
+	hits = kb.search_many(QUERIES[:2], k=3)
+	assert [len(h) for h in hits] == [3, 3]
+	assert all(0 <= i < len(kb.chunks) for h in hits for _, i in h)
+
+
+def test_hybrid_reranks_lexical_candidates(kb, monkeypatch):
+	monkeypatch.setenv("KB_RETRIEVAL", "lexical")
+	lexical = {i for _, i in kb.search_many(["software verification"], k=50)[0]}
+	monkeypatch.setenv("KB_RETRIEVAL", "hybrid")
+	assert {i for _, i in kb.search_many(["software verification"], k=3)[0]} <= lexical
+
+
+def test_failed_query_embeddings_keep_bm25_order(kb, monkeypatch):
+	monkeypatch.setenv("KB_RETRIEVAL", "lexical")
+	lexical = kb.search_many(QUERIES, k=3)
+	monkeypatch.setenv("KB_RETRIEVAL", "hybrid")
+	monkeypatch.setattr(kb, "embedder", ZeroEmbedder())
+	hybrid = kb.search_many(QUERIES, k=3)
+	assert [[i for _, i in h] for h in hybrid] == [[i for _, i in h] for h in lexical]
+	assert hybrid[2] == []  # no lexical match and no embedding: nothing to rank by
+
+
+def test_failed_query_embeddings_give_no_dense_hits(kb, monkeypatch):
+	monkeypatch.setenv("KB_RETRIEVAL", "dense")
+	monkeypatch.setattr(kb, "embedder", ZeroEmbedder())
+	assert kb.search_many(QUERIES[:1], k=3) == [[]]
@@ -0,0 +1,68 @@
+import re
+
+import pytest
+
+from compliance_assistant.rules import _compile_patterns
+from compliance_assistant.scanner import PatternSet, backtracking_risk, stdlib_compatible
+
+regex = pytest.importorskip("regex")
+
+
+def _scan(sources, text, timeout=None):
+	patterns, errors = _compile_patterns(sources)
+	hits, timed_out = PatternSet(patterns).scan(text, text.lower(), timeout)
+	return [(i, m.group(0)) for i, m in hits], timed_out, errors
+
+
+@pytest.mark.parametrize(
+	"pattern",
+	[r"\bTB[[:upper:]]\b", r"\p{Lu}{3}", r"TB{e<=1}D", r"(?|TBD|XXX)"],
+)
+def test_regex_only_syntax_is_not_analysed(pattern):
+	assert not stdlib_compatible(pattern, re.IGNORECASE)
+
+
+@pytest.mark.parametrize("pattern", [r"\bTBD\b", r"XXX+", r"_{3,}", r"to be (determined|defined)"])
+def test_plain_patterns_are_analysed(pattern):
+	assert stdlib_compatible(pattern, re.IGNORECASE)
+
+
+def test_posix_class_pattern_is_scanned_and_reported():
+	# The stdlib reads [[:upper:]] as a set followed by a literal "]", so a
+	# pre-check derived from it would skip this document
+	hits, _, errors = _scan([r"\bTB[[:upper:]]\b"], "Owner: TBD")
+	assert hits == [(0, "TBD")]
+	assert len(errors) == 1 and "not checked" in errors[0]
+
+
+def test_literal_precheck_skips_absent_patterns():
+	hits, _, errors = _scan([r"\bTBD\b", r"XXX+"], "Owner: tbd, version xxxx")
+	assert hits == [(0, "tbd"), (1, "xxxx")]
+	assert errors == []
+
+
+@pytest.mark.parametrize(
+	"pattern, reason",
+	[(r"(a+)+b", "nested quantifier"), (r"(a|ab)*c", "quantified alternation with overlapping branches")],
+)
+def test_backtracking_risk(pattern, reason):
+	assert backtracking_risk(pattern) == reason
+
+
+def test_risky_pattern_is_reported_but_kept():
+	patterns, errors = _compile_patterns([r"(a+)+b", r"\bTBD\b"])
+	assert len(patterns) == 2
+	assert len(errors) == 1 and "backtrack catastrophically" in errors[0]
+
+
+def test_invalid_pattern_is_skipped():
+	patterns, errors = _compile_patterns([r"(unclosed", r"\bTBD\b"])
+	assert len(patterns) == 1
+	assert "invalid pattern" in errors[0]
+
+
+def test_slow_pattern_times_out():
+	text = "a" * 3000 + "\nz"
+	hits, timed_out, _ = _scan([r"a.*a.*a.*a.*a.*z", r"\bz\b"], text, timeout=0.005)
+	assert timed_out == [0]
+	assert hits == [(1, "z")]
@@ -0,0 +1,69 @@
+import os
+import threading
+
+from compliance_assistant.snapshot import KBSnapshots
+
+
+class Builds:
+	"""Fake KB builder that can be held mid-build."""
+
+	def __init__(self):
+		self.calls = []
+		self.gate = threading.Event()
+		self.gate.set()
+
+	def __call__(self, paths):
+		self.gate.wait(5)
+		self.calls.append(tuple(paths))
+		return object()
+
+
+def test_readers_keep_the_old_snapshot_during_a_build(tmp_path):
+	path = tmp_path / "g.txt"
+	path.write_text("one")
+	builds = Builds()
+	snapshots = KBSnapshots(builds)
+	first = snapshots.rebuild([str(path)]).result(5)
+	assert snapshots.current is first and first.version == 1
+
+	builds.gate.clear()
+	pending = snapshots.update(lambda paths: (paths + ("other.txt",), "done"))
+	assert snapshots.current is first  # the writer is still building
+	builds.gate.set()
+	assert pending.result(5) == "done"
+	assert snapshots.current.paths == (str(path), "other.txt")
+	assert snapshots.current.version == 2
+	assert first.paths == (str(path),)  # published snapshots never change
+
+
+def test_changed_source_schedules_one_rebuild(tmp_path):
+	path = tmp_path / "g.txt"
+	path.write_text("one")
+	builds = Builds()
+	snapshots = KBSnapshots(builds)
+	snapshots.rebuild([str(path)]).result(5)
+	snapshots.refresh_if_stale()
+	assert snapshots._refresh is None  # nothing changed
+
+	builds.gate.clear()
+	path.write_text("two, longer")
+	os.utime(path, ns=(1, 1))
+	snapshots.refresh_if_stale()
+	snapshots.refresh_if_stale()  # already queued
+	builds.gate.set()
+	snapshots._refresh.result(5)
+	assert len(builds.calls) == 2
+	assert snapshots.current.version == 2
+
+
+def test_fingerprint_change_schedules_a_rebuild(tmp_path):
+	fingerprint = ["rules-v1"]
+	builds = Builds()
+	snapshots = KBSnapshots(builds, fingerprint=lambda: fingerprint[0])
+	snapshots.rebuild([]).result(5)
+	assert snapshots.current.fingerprint == "rules-v1"
+	fingerprint[0] = "rules-v2"
+	snapshots.refresh_if_stale()
+	snapshots._refresh.result(5)
+	assert snapshots.current.fingerprint == "rules-v2"
+	assert len(builds.calls) == 2
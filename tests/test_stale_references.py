@@ -0,0 +1,57 @@
+import datetime as _dt
+import random
+import re
+
+from compliance_assistant.analysis import DocumentAnalysis
+from compliance_assistant.dates import extract_dates
+from compliance_assistant.validate import _detect_stale_references
+
+
+def _reference(text, years_threshold):
+	"""Slice-based stale-reference check, as the detector worked before DocumentAnalysis."""
+	out = []
+	now = _dt.datetime.now().date()
+	seen = set()
+	for m in extract_dates(text):
+		age = (now - m.date).days / 365.25
+		if age <= years_threshold:
+			continue
+		window = text[max(0, m.start - 80): min(len(text), m.end + 80)].lower()
+		if not re.search(r"\b(effective|last\s*(reviewed|updated)|version|rev(ision)?)\b", window):
+			continue
+		label = "version" if "version" in window else ("effective" if "effective" in window else ("last" if "last" in window else "rev"))
+		if label in seen:
+			continue
+		seen.add(label)
+		out.append((m.text, m.start, m.end))
+	return out
+
+
+def _detected(text, years_threshold=3):
+	return [(f.message.split(": ", 1)[1].split(" (~")[0], *f.pos) for f in _detect_stale_references(DocumentAnalysis(text), years_threshold)]
+
+
+def test_every_label_reported_once():
+	filler = " filler" * 30 + "\n"
+	text = filler.join([
+		"Version 1.0 dated 2015-01-01",
+		"Effective 2016-02-02",
+		"Last reviewed 2017-03-03",
+		"Rev B 2014-04-04",
+		"Version 0.9 2013-05-05",
+	])
+	found = _detected(text)
+	assert [t for t, _, _ in found] == ["2015-01-01", "2016-02-02", "2017-03-03", "2014-04-04"]
+	assert found == _reference(text, 3)
+
+
+def test_matches_reference_on_random_documents():
+	rng = random.Random(5)
+	tokens = [
+		"Version", "version 2.0", "Effective", "last  reviewed", "Last updated", "rev", "Revision", "revise",
+		"01/02/2015", "2019", "12-Mar-2018", "2017-05-05", "31/02/2016", "2099", "Procedure", "word",
+		"\n", "\n\n", " ", "İ", "Σ", "N/A",
+	]
+	for _ in range(400):
+		text = "".join(rng.choice(tokens) + rng.choice([" ", "\n", ""]) for _ in range(rng.randint(0, 400)))
+		assert _detected(text) == _reference(text, 3), text